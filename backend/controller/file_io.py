@@ -0,0 +1,31 @@
+"""
+File helpers shared by the on-disk stores and caches.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import IO, Any, Callable
+
+
+def atomic_write(path: os.PathLike, writer: Callable[[IO], Any], binary: bool = True) -> None:
+    """
+    Write ``path`` through ``writer(file)`` so readers never see a partial file.
+
+    The data goes to a temporary file next to the target, named per process
+    and thread so concurrent writers don't clobber each other, which is then
+    swapped in with ``os.replace``.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if binary:
+            with open(tmp_path, "wb") as f:
+                writer(f)
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                writer(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
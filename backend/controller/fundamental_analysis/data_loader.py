@@ -1,15 +1,16 @@
 import datetime as dt
-import os
 from typing import Dict,List
 
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from alpaca.data.historical.news import NewsClient
-from alpaca.data.requests import NewsRequest
 from pathlib import Path
 from dotenv import load_dotenv
 
+from controller.fundamental_analysis.news_store import news_store
+from controller.fundamental_analysis.yf_cache import yf_cache
+from controller.providers import providers
+
 # load env file since it is one dir above
 env_path = Path(__file__).parent.parent.parent / '.env'  # Changed to go up two directories to reach /backend
 print(f"Looking for .env file at: {env_path}")
@@ -19,18 +20,27 @@ load_dotenv(dotenv_path=env_path)
 pd.set_option('future.no_silent_downcasting', True)
 
 YEARS_OF_FINANCIALS = 4
-NEWS_LIMIT = 15
+# The only ``Ticker.info`` fields we use
+INFO_FIELDS = ["trailingPE", "priceToBook", "sharesOutstanding"]
 
 def fetch_fundamentals(ticker:str) -> Dict[str, Dict]:
     tk = yf.Ticker(ticker)
 
+    # Downloads go through the on-disk cache, each kind with its own TTL
+    inc_raw = yf_cache.get_or_fetch("statements", ticker, "income_stmt", lambda: tk.income_stmt)
+    bal_raw = yf_cache.get_or_fetch("statements", ticker, "balance_sheet", lambda: tk.balance_sheet)
+    # ``info`` is read once; only the fields we use are kept
+    info = yf_cache.get_or_fetch("info", ticker, "info", lambda: {field: value for field, value in tk.info.items() if field in INFO_FIELDS})
+
     # Get financial statements (Income statement & balance sheet)
-    inc = tk.income_stmt.T.head(YEARS_OF_FINANCIALS)
+    inc = inc_raw.T.head(YEARS_OF_FINANCIALS)
     inc = inc.fillna(0).infer_objects(copy=False)
 
-    bal = tk.balance_sheet.T.head(YEARS_OF_FINANCIALS)
+    bal = bal_raw.T.head(YEARS_OF_FINANCIALS)
     bal = bal.fillna(0).infer_objects(copy=False)
 
+    hist_prices = fetch_fiscal_prices(tk, ticker, inc.index)
+
     # Select only the important rows
     inc_cols = [col for col in [
         "Total Revenue",
@@ -51,78 +61,99 @@ def fetch_fundamentals(ticker:str) -> Dict[str, Dict]:
 
     # Calculations using helper functions
     book_values = calculate_book_values(bal)
-    hist_pe = calculate_historical_pe(inc, tk)
+    hist_pe = calculate_historical_pe(inc, hist_prices, info.get("sharesOutstanding"))
     margins = calculate_margins(inc)
     debt_to_equity = calculate_debt_to_equity(bal)
 
     return {
         "income": inc_trimmed,
         "balance": bal_trimmed,
-        "trailingPE": tk.info.get("trailingPE"),
-        "currentPBV": tk.info.get("priceToBook"),
+        "trailingPE": info.get("trailingPE"),
+        "currentPBV": info.get("priceToBook"),
         "bookValueHistory": book_values,
         "historicalPE": hist_pe,
         "margins": margins,
         "debtToEquityHistory": debt_to_equity,
     }
 
+# Trading days fetched before the earliest fiscal date, so a year end on a weekend or holiday still finds a close
+PRICE_LOOKBACK_DAYS = 10
+
+def fetch_fiscal_prices(tk, ticker, fiscal_dates) -> pd.Series:
+    """Daily closes covering only the fiscal dates (plus a few days before the first one)"""
+    if len(fiscal_dates) == 0:
+        return pd.Series(dtype=float)
+    start = (fiscal_dates.min() - pd.Timedelta(days=PRICE_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+    end = (fiscal_dates.max() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    return yf_cache.get_or_fetch(
+        "history", ticker, f"close_{start}_{end}",
+        lambda: tk.history(start=start, end=end, interval="1d")["Close"]
+    )
+
+def _date_keys(index) -> list:
+    return [fiscal_date.strftime("%Y-%m-%d") for fiscal_date in index]
+
+def _none_for_nan(frame):
+    return frame.astype(object).where(frame.notna(), None)
+
 def calculate_book_values(bal):
     try:
         return (bal["Total Assets"] - bal["Total Liab"]).to_dict()
     except Exception:
         return {}
 
-def calculate_historical_pe(inc, tk):
+def calculate_historical_pe(inc, hist_prices, shares_outstanding):
     try:
-        hist_prices = tk.history(period="5y", interval="1d")["Close"]
-        shares_outstanding = tk.info.get("sharesOutstanding", None)
-
-        hist_pe = {}
-        if shares_outstanding:
-            for fiscal_date in inc.index:
-                fiscal_date_str = fiscal_date.strftime("%Y-%m-%d")
-                price = hist_prices[:fiscal_date_str].iloc[-1] if fiscal_date_str in hist_prices.index else None
-                net_income = inc.at[fiscal_date, "Net Income"] if "Net Income" in inc.columns else None
-
-                if price and net_income:
-                    eps = net_income / shares_outstanding
-                    pe = price / eps if eps != 0 else None
-                    hist_pe[fiscal_date_str] = pe
-        return hist_pe
-    except Exception:
+        if not shares_outstanding or "Net Income" not in inc.columns or hist_prices is None or hist_prices.empty:
+            return {}
+
+        # Close of the last trading day on or before each fiscal date
+        prices = hist_prices.rename("price").rename_axis("date").reset_index()
+        # Keep the exchange-local calendar day: dropping the tz keeps wall time, converting to UTC would not
+        dates = pd.to_datetime(prices["date"])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        # merge_asof needs both keys in the same unit; yfinance mixes [ns] statements with [us]/[s] prices
+        prices["date"] = dates.dt.normalize().astype("datetime64[ns]")
+        fiscal = pd.DataFrame({
+            "date": pd.to_datetime(inc.index).tz_localize(None).normalize().astype("datetime64[ns]"),
+            "net_income": inc["Net Income"].to_numpy(dtype=float),
+            "fiscal_date": _date_keys(inc.index),
+        }).sort_values("date")
+        joined = pd.merge_asof(fiscal, prices.sort_values("date"), on="date", direction="backward")
+
+        joined = joined[joined["price"].notna() & (joined["price"] != 0) & (joined["net_income"] != 0)]
+        eps = joined["net_income"] / shares_outstanding
+        joined["pe"] = joined["price"] / eps
+        # Same order as the income statement (newest first)
+        return joined.set_index("fiscal_date")["pe"].reindex(_date_keys(inc.index)).dropna().to_dict()
+    except Exception as e:
+        print(f"❌ Failed to calculate historical P/E: {e}")
         return {}
 
 def calculate_margins(inc):
-    margins = {}
     try:
-        for fiscal_date in inc.index:
-            revenue = inc.at[fiscal_date, "Total Revenue"]
-            gross_profit = inc.at[fiscal_date, "Gross Profit"]
-            operating_income = inc.at[fiscal_date, "Operating Income"]
-            net_income = inc.at[fiscal_date, "Net Income"]
-
-            margins[fiscal_date.strftime("%Y-%m-%d")] = {
-                "grossMargin": gross_profit / revenue if revenue else None,
-                "operatingMargin": operating_income / revenue if revenue else None,
-                "netMargin": net_income / revenue if revenue else None,
-            }
+        revenue = inc["Total Revenue"].astype(float).replace(0, np.nan)
+        margins = pd.DataFrame({
+            "grossMargin": inc["Gross Profit"] / revenue,
+            "operatingMargin": inc["Operating Income"] / revenue,
+            "netMargin": inc["Net Income"] / revenue,
+        })
+        margins.index = _date_keys(inc.index)
+        return _none_for_nan(margins).to_dict(orient="index")
     except Exception:
-        pass
-    return margins
+        return {}
 
 def calculate_debt_to_equity(bal):
-    debt_to_equity = {}
     try:
-        for fiscal_date in bal.index:
-            total_debt = bal.at[fiscal_date, "Total Debt"] if "Total Debt" in bal.columns else 0
-            equity = bal.at[fiscal_date, "Total Stockholder Equity"] if "Total Stockholder Equity" in bal.columns else 0
-
-            debt_to_equity[fiscal_date.strftime("%Y-%m-%d")] = (
-                total_debt / equity if equity else None
-            )
+        zeros = pd.Series(0.0, index=bal.index)
+        total_debt = bal["Total Debt"].astype(float) if "Total Debt" in bal.columns else zeros
+        equity = bal["Total Stockholder Equity"].astype(float) if "Total Stockholder Equity" in bal.columns else zeros
+        debt_to_equity = total_debt / equity.replace(0, np.nan)
+        debt_to_equity.index = _date_keys(bal.index)
+        return _none_for_nan(debt_to_equity).to_dict()
     except Exception:
-        pass
-    return debt_to_equity
+        return {}
 
 
 def convert_fundamentals_to_JSON(raw_data: dict) -> dict:
@@ -137,39 +168,15 @@ def convert_fundamentals_to_JSON(raw_data: dict) -> dict:
 
     return {k: clean_value(v) for k, v in raw_data.items()}
 
-NEWS_LOOKBACK_DAYS = 30
-NEWS_LIMIT_PER_TICKER = 15
-
-def fetch_news(ticker:str) -> list[dict]:
-    alpaca_api_key = os.getenv("ALPACA_API_KEY_ID")
-    alpaca_api_secret = os.getenv("ALPACA_API_SECRET_KEY")
-
-    if not alpaca_api_key or not alpaca_api_secret:
-        raise RuntimeError(f"Alpaca API Keys missing in .env file at {env_path}")
-
-    client = NewsClient(api_key=alpaca_api_key, secret_key=alpaca_api_secret)
-    start_date = (pd.Timestamp.today() - pd.Timedelta(days=NEWS_LOOKBACK_DAYS)).strftime("%Y-%m-%d")
-
-    req = NewsRequest(
-        symbols=ticker,
-        start=start_date,
-        limit=NEWS_LIMIT_PER_TICKER
-    )
-
+def fetch_news_batch(tickers: List[str]) -> Dict[str, list[dict]]:
+    """Recent articles of every ticker, fetched incrementally in multi-symbol requests"""
+    # Shared client, created once per process
+    client = providers.get("alpaca_news")
     try:
-        news_df = client.get_news(req).df
+        return news_store.update(client, tickers)
     except Exception as e:
-        print(f"failed to fetch news for {ticker}: {e}")
-        return []
-
-    # Only keep the important fields
-    articles = [
-        {
-            "headline": row["headline"],
-            "summary": row["summary"],
-            "url": row["url"]
-        }
-        for _, row in news_df.iterrows()
-    ]
-
-    return articles
\ No newline at end of file
+        print(f"failed to fetch news for {', '.join(tickers)}: {e}")
+        return {ticker: [] for ticker in tickers}
+
+def fetch_news(ticker:str) -> list[dict]:
+    return fetch_news_batch([ticker])[ticker]
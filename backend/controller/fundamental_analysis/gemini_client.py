@@ -1,33 +1,34 @@
+import asyncio
 import os
-import json
-import time
 import google.api_core.exceptions
-import google.generativeai as genai
 from pathlib import Path
 from dotenv import load_dotenv
 
 from controller.fundamental_analysis.system_prompt import SYSTEM_PROMPT
+from controller.llm_cache import llm_cache
+from controller.llm_client import llm_client
+from controller.llm_parsing import parse_recommendations
+from controller.prompt_encoding import PROMPT_TOKEN_BUDGET, estimate_tokens, fit_dataset_to_budget, log_prompt_size
 
 # Load .env
 env_path = Path(__file__).parent.parent.parent / '.env'  # Changed to go up two directories to reach /backend
 print(f"Looking for .env file at: {env_path}")
 load_dotenv(dotenv_path=env_path)
 
-def ask_gemini(data: dict, max_retries=3, use_fallback_model=True) -> dict:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError(f"Gemini API key missing in .env file at {env_path}")
+# Bump whenever the prompt template or system prompt changes so cached analyses are not reused
+PROMPT_VERSION = "2"
 
-    # Configure the Gemini API
-    genai.configure(api_key=api_key)
+# Cap on tickers per prompt, so each answer stays well within the output token limit
+BATCH_MAX_TICKERS = int(os.getenv("ANALYSIS_BATCH_MAX_TICKERS", 20))
+# Extra rounds for batches that failed
+BATCH_RETRIES = int(os.getenv("ANALYSIS_BATCH_RETRIES", 1))
 
-    # Create a structured prompt that includes both the system prompt and the data
-    structured_prompt = f"""
-{SYSTEM_PROMPT}
+PROMPT_TEMPLATE = """
+{system_prompt}
 
 Analyze the following JSON data for each stock individually:
 
-{json.dumps(data, indent=2)}
+{data}
 
 Remember to return your analysis in the following JSON structure:
 {{
@@ -45,6 +46,36 @@ Remember to return your analysis in the following JSON structure:
 }}
 """
 
+def create_prompt(data: dict, token_budget=None) -> str:
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    # Whatever is left of the budget after the instructions goes to the dataset
+    overhead = estimate_tokens(PROMPT_TEMPLATE.format(system_prompt=SYSTEM_PROMPT, data=""))
+    encoded = fit_dataset_to_budget(data, token_budget - overhead)
+    return PROMPT_TEMPLATE.format(system_prompt=SYSTEM_PROMPT, data=encoded)
+
+async def complete_recommendations(model_name, data, recommendations, missing, max_retries=3):
+    """
+    Ask the model again for just the missing tickers and merge the answers in
+    ticker order. Returns the recommendations and the tickers still missing.
+    """
+    print(f"Re-querying {model_name} for {', '.join(missing)}")
+    prompt = create_prompt({ticker: data[ticker] for ticker in missing})
+    response_text = await llm_client.generate(model_name, prompt, max_retries=max_retries)
+    try:
+        more, still_missing = parse_recommendations(response_text, missing)
+    except ValueError as e:
+        print(f"Error with follow-up from model {model_name}: {e}")
+        return recommendations, missing
+    by_ticker = {recommendation["ticker"]: recommendation for recommendation in recommendations + more}
+    return [by_ticker[ticker] for ticker in data if ticker in by_ticker], still_missing
+
+async def analyze_batch(data: dict, max_retries=3, use_fallback_model=True) -> dict:
+    """Analyze one batch of tickers with a single prompt"""
+    # Create a structured prompt that includes both the system prompt and the data
+    tickers = list(data)
+    structured_prompt = create_prompt(data)
+    log_prompt_size(f"fundamental analysis of {', '.join(data)}", structured_prompt)
+
     # Try with the powerful model first, then fall back to a simpler model if needed
     models_to_try = ['gemini-1.5-pro']
     
@@ -52,6 +83,14 @@ Remember to return your analysis in the following JSON structure:
     if use_fallback_model:
         models_to_try.append('gemini-1.5-flash')  # Fallback to a model with higher quota limits
     
+    # Identical prompts (same fundamentals, news, template and model) reuse the stored analysis
+    cache_keys = {model_name: llm_cache.key(structured_prompt, model_name, PROMPT_VERSION) for model_name in models_to_try}
+    for model_name, cache_key in cache_keys.items():
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"Using cached analysis from model: {model_name}")
+            return cached
+    
     last_exception = None
     
     for model_name in models_to_try:
@@ -59,41 +98,32 @@ Remember to return your analysis in the following JSON structure:
         while retries < max_retries:
             try:
                 print(f"Attempting to use model: {model_name}")
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(structured_prompt)
+                # Rate limits are retried inside the client, with a backoff shared by all callers
+                response_text = await llm_client.generate(model_name, structured_prompt, max_retries=max_retries)
                 
-                # Try to extract structured JSON from the response
-                response_text = response.text
+                # Keep the valid recommendations and re-query only the tickers that are missing
+                recommendations, missing = parse_recommendations(response_text, tickers)
+                if not recommendations:
+                    raise ValueError("No valid recommendations in response")
+                if missing:
+                    recommendations, missing = await complete_recommendations(
+                        model_name, data, recommendations, missing, max_retries
+                    )
+                parsed_json = {"recommendations": recommendations}
                 
-                # Find JSON content between triple backticks if present
-                if "```json" in response_text and "```" in response_text:
-                    json_content = response_text.split("```json")[1].split("```")[0]
-                elif "```" in response_text:
-                    json_content = response_text.split("```")[1].split("```")[0]
+                if missing:
+                    # Return what we have rather than regenerate it, but don't cache it
+                    print(f"❌ No valid recommendation from {model_name} for {', '.join(missing)}")
                 else:
-                    json_content = response_text
-                    
-                parsed_json = json.loads(json_content)
-                
-                # Validate the response structure
-                if "recommendations" not in parsed_json:
-                    raise ValueError("Missing 'recommendations' key in response")
-                    
+                    llm_cache.put(cache_keys[model_name], parsed_json, model_name)
                 return parsed_json
                 
             except google.api_core.exceptions.ResourceExhausted as e:
+                # The client already used up the retries for this model
                 last_exception = e
-                retry_delay = 10  # Default retry delay in seconds
-                
-                # Try to extract retry delay from error message if available
-                if hasattr(e, 'retry_delay') and hasattr(e.retry_delay, 'seconds'):
-                    retry_delay = e.retry_delay.seconds
-                
-                print(f"Rate limit exceeded. Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                retries += 1
+                break
                 
-            except (json.JSONDecodeError, ValueError) as e:
+            except ValueError as e:
                 last_exception = e
                 print(f"Error with model {model_name}: {e}")
                 # Don't retry for JSON parsing errors, try another model
@@ -103,7 +133,88 @@ Remember to return your analysis in the following JSON structure:
                 last_exception = e
                 print(f"Unexpected error with model {model_name}: {e}")
                 retries += 1
-                time.sleep(5)  # Wait 5 seconds before retrying
+                if retries < max_retries:
+                    await asyncio.sleep(5)  # Wait 5 seconds before retrying
     
     # If we've exhausted all models and retries
-    raise RuntimeError(f"Failed to get valid response from Gemini API after multiple attempts: {last_exception}") 
\ No newline at end of file
+    raise RuntimeError(f"Failed to get valid response from Gemini API after multiple attempts: {last_exception}")
+
+def plan_batches(data: dict, token_budget=None, max_tickers=None) -> list:
+    """
+    Pack tickers, in order, into as few batches as possible whose prompts fit
+    ``token_budget``. A ticker too large for the budget on its own gets its
+    own batch, where its news is shortened to fit.
+    """
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    max_tickers = max_tickers or BATCH_MAX_TICKERS
+    available = token_budget - estimate_tokens(PROMPT_TEMPLATE.format(system_prompt=SYSTEM_PROMPT, data=""))
+
+    batches = []
+    batch, batch_tokens = [], 0
+    for ticker, entry in data.items():
+        tokens = estimate_tokens(fit_dataset_to_budget({ticker: entry}, available))
+        if batch and (batch_tokens + tokens > available or len(batch) >= max_tickers):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(ticker)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def with_missing_tickers(result: dict, data: dict) -> dict:
+    """Record (and log) the tickers of ``data`` left without a recommendation"""
+    answered = {recommendation["ticker"] for recommendation in result.get("recommendations", [])}
+    missing = [ticker for ticker in data if ticker not in answered]
+    if missing:
+        print(f"❌ No recommendation for {', '.join(missing)}; they are left out of the analysis")
+    return {**result, "missing_tickers": missing}
+
+async def ask_gemini_async(data: dict, max_retries=3, use_fallback_model=True) -> dict:
+    """
+    Analyze any number of tickers: they are packed into token-budgeted batches
+    that are sent concurrently, and the recommendations are merged in ticker
+    order. Batches that fail are retried on their own. Tickers that still have
+    no recommendation are listed under ``missing_tickers``.
+    """
+    if not data:
+        return {"recommendations": [], "missing_tickers": []}
+    batches = plan_batches(data)
+    if len(batches) > 1:
+        print(f"Analyzing {len(data)} tickers in {len(batches)} batches")
+
+    results = {}
+    pending = list(range(len(batches)))
+    last_exception = None
+    for attempt in range(1 + BATCH_RETRIES):
+        outcomes = await asyncio.gather(
+            *(analyze_batch({ticker: data[ticker] for ticker in batches[i]}, max_retries, use_fallback_model)
+              for i in pending),
+            return_exceptions=True
+        )
+        failed = []
+        for i, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                last_exception = outcome
+                print(f"❌ Batch {', '.join(batches[i])} failed: {outcome}")
+                failed.append(i)
+            else:
+                results[i] = outcome
+        pending = failed
+        if not pending:
+            break
+        if attempt < BATCH_RETRIES:
+            print(f"Retrying {len(pending)} failed batches")
+
+    if not results:
+        raise RuntimeError(f"Failed to get valid response from Gemini API for any batch: {last_exception}")
+    by_ticker = {
+        recommendation["ticker"]: recommendation
+        for result in results.values()
+        for recommendation in result.get("recommendations", [])
+    }
+    return with_missing_tickers({"recommendations": [by_ticker[ticker] for ticker in data if ticker in by_ticker]}, data)
+
+def ask_gemini(data: dict, max_retries=3, use_fallback_model=True) -> dict:
+    """Blocking wrapper around ask_gemini_async for callers without an event loop"""
+    return asyncio.run(ask_gemini_async(data, max_retries, use_fallback_model))
@@ -1,26 +1,67 @@
-from controller.fundamental_analysis.data_loader import fetch_fundamentals, fetch_news, convert_fundamentals_to_JSON
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from controller.fundamental_analysis.data_loader import fetch_fundamentals, fetch_news_batch, convert_fundamentals_to_JSON
 from controller.fundamental_analysis.gemini_client import ask_gemini
+from controller.fundamental_analysis.yf_cache import yf_cache
 from controller.fundamental_analysis.mongo_client import save_to_mongo, test_mongo_connection
 import json
 
 TICKERS = ["AAPL", "TSLA", "NVDA"]
 
-def collect_dataset(tickers):
+# Fetches running at once across all tickers
+MAX_CONCURRENCY = int(os.getenv("FUNDAMENTALS_CONCURRENCY", 8))
+# Requests in flight per provider, so a large universe doesn't trip rate limits
+PROVIDER_LIMITS = {
+    "yfinance": threading.BoundedSemaphore(int(os.getenv("YFINANCE_CONCURRENCY", 4))),
+}
+
+def _limited(provider, fetch, *args):
+    with PROVIDER_LIMITS[provider]:
+        return fetch(*args)
+
+def _collect_fundamentals(tkr):
+    return convert_fundamentals_to_JSON(_limited("yfinance", fetch_fundamentals, tkr))
+
+def collect_dataset(tickers, max_concurrency=None):
+    """
+    Fetch fundamentals and news for all tickers in parallel. A ticker whose
+    fundamentals fail is left out of the bundle; failed news becomes an empty list.
+    """
     bundle = {}
-    for tkr in tickers:
-        print(f"Collecting data for {tkr}...")
-        fundamentals = fetch_fundamentals(tkr)
-        news = fetch_news(tkr)
-        clean_fundamentals = convert_fundamentals_to_JSON(fundamentals)
-        bundle[tkr] = {
-            "fundamentals": clean_fundamentals,
-            "news": news
-        }
+    max_workers = max(1, min(max_concurrency or MAX_CONCURRENCY, len(tickers) + 1))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fundamentals") as executor:
+        # News for every ticker comes from a few sequential multi-symbol requests, alongside the fundamentals
+        news_future = executor.submit(fetch_news_batch, list(tickers))
+        futures = []
+        for tkr in tickers:
+            print(f"Collecting data for {tkr}...")
+            futures.append((tkr, executor.submit(_collect_fundamentals, tkr)))
+
+        try:
+            news_by_ticker = news_future.result()
+        except Exception as e:
+            print(f"❌ Error collecting news: {e}")
+            news_by_ticker = {}
+
+        # Assembled in ticker order so the saved dataset is deterministic
+        for tkr, fundamentals_future in futures:
+            try:
+                clean_fundamentals = fundamentals_future.result()
+            except Exception as e:
+                print(f"❌ Error collecting fundamentals for {tkr}: {e}")
+                continue
+            bundle[tkr] = {
+                "fundamentals": clean_fundamentals,
+                "news": news_by_ticker.get(tkr, [])
+            }
     return bundle
 
-def main():
+def main(tickers=None):
     # test_mongo_connection()
-    dataset = collect_dataset(TICKERS)
+    dataset = collect_dataset(tickers or TICKERS)
+    print(f"yfinance cache: {yf_cache.stats()}")
 
     # Save the raw dataset to a file
     with open("dataset.json", "w") as f:
@@ -4,6 +4,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
 
+from controller.snapshot_cache import snapshot_cache
+
 # Load .env
 env_path = Path(__file__).parent.parent.parent / '.env'  # Changed to go up two directories to reach /backend
 print(f"Looking for .env file at: {env_path}")
@@ -44,6 +46,7 @@ def save_to_mongo(dataset: dict, result: dict):
         "stocks": financial_stocks
     }
     reports_collection.insert_one(reports_document)
+    snapshot_cache.invalidate("financial_reports")
     print("✅ Saved raw dataset to 'financial_reports' collection.")
 
     # --- Prepare fundamental_analysis document ---
@@ -62,6 +65,10 @@ def save_to_mongo(dataset: dict, result: dict):
         "timestamp": timestamp_now,
         "stocks": analysis_stocks
     }
+    # Tickers the model never answered for, so their absence is visible to readers
+    if result.get("missing_tickers"):
+        analysis_document["missing_tickers"] = result["missing_tickers"]
     analysis_collection.insert_one(analysis_document)
+    snapshot_cache.invalidate("fundamental_analysis")
     print("✅ Saved structured analysis to 'fundamental_analysis' collection.")
 
@@ -0,0 +1,162 @@
+"""
+Incremental store of Alpaca news articles.
+
+News for many tickers is fetched with one multi-symbol ``NewsRequest`` per
+chunk of tickers; alpaca-py follows the page tokens until the requested limit
+is reached. The limit is shared by the chunk, so when a response is cut off
+the tickers it covered only partially are requested again on their own.
+Articles are kept once by id in ``<NEWS_STORE_PATH>`` (JSON), with each
+ticker's newest article ids and a high-water mark, so later runs only ask for
+articles published since the previous run.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from alpaca.data.requests import NewsRequest
+
+from controller.file_io import atomic_write
+
+DEFAULT_STORE_PATH = Path(__file__).parent.parent.parent / "data" / "news_store.json"
+
+NEWS_LOOKBACK_DAYS = 30
+NEWS_LIMIT_PER_TICKER = 15
+# Tickers per news request
+NEWS_SYMBOLS_PER_REQUEST = int(os.getenv("NEWS_SYMBOLS_PER_REQUEST", 50))
+
+ARTICLE_FIELDS = ["headline", "summary", "url"]
+
+
+class NewsStore:
+    def __init__(self, path: Optional[os.PathLike] = None):
+        self.path = Path(path or os.getenv("NEWS_STORE_PATH") or DEFAULT_STORE_PATH)
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict:
+        """``{"articles": {id: article}, "tickers": {ticker: {"ids": [...], "high_water_mark": iso}}}``"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"articles": {}, "tickers": {}}
+
+    def save(self, state: Dict) -> None:
+        atomic_write(self.path, lambda f: json.dump(state, f), binary=False)
+
+    @staticmethod
+    def _fetch(client, tickers: List[str], start: pd.Timestamp, limit: int) -> Tuple[pd.DataFrame, bool]:
+        """
+        One request (paged by the SDK) for the news of several tickers, one row
+        per (article, ticker), and whether the response was cut off at ``limit``
+        """
+        request = NewsRequest(
+            symbols=",".join(tickers),
+            start=start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            limit=limit,
+        )
+        news = client.get_news(request).df
+        if news is None or news.empty:
+            return pd.DataFrame(columns=["id", "ticker", "created_at"] + ARTICLE_FIELDS), False
+        truncated = len(news) >= limit
+        news = news.reset_index(drop="id" in news.columns)
+        if "symbols" in news.columns:
+            news = news.explode("symbols").rename(columns={"symbols": "ticker"})
+        else:
+            news["ticker"] = tickers[0] if len(tickers) == 1 else None
+        news = news[news["ticker"].isin(tickers)].assign(created_at=lambda df: pd.to_datetime(df["created_at"], utc=True))
+        return news[["id", "ticker", "created_at"] + ARTICLE_FIELDS], truncated
+
+    @staticmethod
+    def _start(entry: Optional[Dict], window_start: pd.Timestamp) -> pd.Timestamp:
+        """Where a ticker's next fetch begins; tickers seen for the first time go back the whole window"""
+        mark = (entry or {}).get("high_water_mark")
+        return max(pd.Timestamp(mark), window_start) if mark else window_start
+
+    def update(self, client, tickers: Iterable[str], lookback_days: int = NEWS_LOOKBACK_DAYS,
+               limit_per_ticker: int = NEWS_LIMIT_PER_TICKER) -> Dict[str, List[Dict]]:
+        """
+        Fetch the articles published since each ticker's high-water mark and
+        return the newest ``limit_per_ticker`` articles of every ticker from the
+        last ``lookback_days`` days.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        window_start = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=lookback_days)
+
+        with self._lock:
+            state = self.load()
+            articles = state["articles"]
+            ticker_state = state["tickers"]
+
+            for i in range(0, len(tickers), NEWS_SYMBOLS_PER_REQUEST):
+                chunk = tickers[i:i + NEWS_SYMBOLS_PER_REQUEST]
+                # The oldest mark in the chunk
+                start = min(self._start(ticker_state.get(ticker), window_start) for ticker in chunk)
+                print(f"Fetching news since {start:%Y-%m-%d %H:%M} for {', '.join(chunk)}")
+                fetched_at = pd.Timestamp.now(tz="UTC")
+                news, truncated = self._fetch(client, chunk, start, limit_per_ticker * len(chunk))
+
+                complete = set(chunk)
+                if truncated:
+                    # Heavily covered tickers can use up the shared limit; a ticker with
+                    # fewer rows than it keeps may be missing older articles
+                    counts = news["ticker"].value_counts()
+                    starved = [ticker for ticker in chunk if counts.get(ticker, 0) < limit_per_ticker]
+                    frames = [news]
+                    for ticker in starved:
+                        print(f"News response was cut off, fetching {ticker} on its own")
+                        try:
+                            ticker_news, _ = self._fetch(
+                                client, [ticker], self._start(ticker_state.get(ticker), window_start), limit_per_ticker
+                            )
+                        except Exception as e:
+                            # Keep its mark, so the next run asks for the same window again
+                            print(f"❌ Failed to fetch news for {ticker}: {e}")
+                            complete.discard(ticker)
+                            continue
+                        frames.append(ticker_news)
+                    news = pd.concat([frame for frame in frames if not frame.empty] or [news])
+                    news = news.drop_duplicates(["id", "ticker"])
+
+                # Each article is stored once, however many tickers mention it
+                unique = news.drop_duplicates("id")
+                for article_id, created_at, *fields in zip(
+                    unique["id"].astype(str), unique["created_at"].map(pd.Timestamp.isoformat),
+                    *(unique[field] for field in ARTICLE_FIELDS)
+                ):
+                    articles[article_id] = {"created_at": created_at, **dict(zip(ARTICLE_FIELDS, fields))}
+
+                new_ids = news.sort_values("created_at").groupby("ticker")["id"].agg(lambda ids: list(ids.astype(str)))
+                for ticker in chunk:
+                    entry = ticker_state.setdefault(ticker, {"ids": [], "high_water_mark": None})
+                    entry["ids"] += [article_id for article_id in new_ids.get(ticker, []) if article_id not in entry["ids"]]
+                    if ticker in complete:
+                        # Everything published before the request has been seen, including for tickers without news
+                        entry["high_water_mark"] = fetched_at.isoformat()
+
+            # Keep only each ticker's newest articles inside the window, and drop unreferenced articles
+            for entry in ticker_state.values():
+                ids = [
+                    article_id for article_id in entry["ids"]
+                    if article_id in articles and pd.Timestamp(articles[article_id]["created_at"]) >= window_start
+                ]
+                ids.sort(key=lambda article_id: articles[article_id]["created_at"])
+                entry["ids"] = ids[-limit_per_ticker:]
+            referenced = {article_id for entry in ticker_state.values() for article_id in entry["ids"]}
+            state["articles"] = {article_id: article for article_id, article in articles.items() if article_id in referenced}
+            self.save(state)
+
+            result = {}
+            for ticker in tickers:
+                ids = ticker_state.get(ticker, {}).get("ids", [])
+                # Newest first, like the API returns them
+                result[ticker] = [
+                    {field: state["articles"][article_id].get(field) for field in ARTICLE_FIELDS}
+                    for article_id in reversed(ids)
+                ]
+        return result
+
+
+news_store = NewsStore()
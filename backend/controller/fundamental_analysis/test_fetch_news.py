@@ -1,4 +1,5 @@
-from data_loader import fetch_news
+# Run from backend/: python -m controller.fundamental_analysis.test_fetch_news
+from controller.fundamental_analysis.data_loader import fetch_news
 import json
 
 if __name__ == "__main__":
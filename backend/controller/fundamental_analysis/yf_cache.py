@@ -0,0 +1,103 @@
+"""
+On-disk cache for yfinance downloads.
+
+Each kind of data has its own TTL: annual statements change a few times a
+year, ``info`` fields and price history daily. Values (DataFrames, Series or
+dicts) are pickled under ``<YF_CACHE_DIR>/<kind>/<TICKER>_<name>.pkl``, so a
+hit needs no network at all.
+"""
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from controller.file_io import atomic_write
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent.parent / "data" / "yf_cache"
+
+DAY = 24 * 60 * 60
+DEFAULT_TTLS = {
+    "statements": 7 * DAY,
+    "info": DAY,
+    "history": DAY,
+}
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or getattr(value, "empty", False) or (isinstance(value, dict) and not value)
+
+
+class YFinanceCache:
+    def __init__(self, root: Optional[os.PathLike] = None, ttls: Optional[Dict[str, float]] = None,
+                 force_refresh: Optional[bool] = None):
+        self.root = Path(root or os.getenv("YF_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.ttls = {
+            kind: float(os.getenv(f"YF_CACHE_{kind.upper()}_TTL_SECONDS", ttl))
+            for kind, ttl in DEFAULT_TTLS.items()
+        }
+        self.ttls.update(ttls or {})
+        # Refetch everything but still write the fresh values to the cache
+        self.force_refresh = (
+            force_refresh if force_refresh is not None
+            else os.getenv("YF_CACHE_FORCE_REFRESH", "false").lower() == "true"
+        )
+        self._lock = threading.Lock()
+        self._stats = {kind: {"hits": 0, "misses": 0} for kind in self.ttls}
+
+    def _path(self, kind: str, ticker: str, name: str) -> Path:
+        return self.root / kind / f"{ticker.upper()}_{name}.pkl"
+
+    def _count(self, kind: str, outcome: str) -> None:
+        with self._lock:
+            self._stats.setdefault(kind, {"hits": 0, "misses": 0})[outcome] += 1
+
+    def get(self, kind: str, ticker: str, name: str) -> Any:
+        """Cached value, or None if it is missing, expired or refresh is forced"""
+        if self.force_refresh:
+            return None
+        path = self._path(kind, ticker, name)
+        try:
+            with open(path, "rb") as f:
+                created_at, value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if created_at + self.ttls.get(kind, DAY) <= time.time():
+            return None
+        return value
+
+    def put(self, kind: str, ticker: str, name: str, value: Any) -> None:
+        atomic_write(
+            self._path(kind, ticker, name),
+            lambda f: pickle.dump((time.time(), value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+
+    def get_or_fetch(self, kind: str, ticker: str, name: str, fetch: Callable[[], Any]) -> Any:
+        """Cached value, or the result of ``fetch()`` which is then cached unless it is empty"""
+        value = self.get(kind, ticker, name)
+        if value is not None:
+            self._count(kind, "hits")
+            return value
+        self._count(kind, "misses")
+        value = fetch()
+        # An empty result is usually a rate limit or transient failure; don't pin it for the whole TTL
+        if not _is_empty(value):
+            self.put(kind, ticker, name, value)
+        return value
+
+    def clear(self, kind: Optional[str] = None) -> None:
+        """Delete cached values of one kind, or all of them"""
+        for path in self.root.glob(f"{kind or '*'}/*.pkl"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters and TTL per kind"""
+        with self._lock:
+            return {
+                kind: {**counts, "ttl_seconds": self.ttls.get(kind)}
+                for kind, counts in self._stats.items()
+            }
+
+
+yf_cache = YFinanceCache()
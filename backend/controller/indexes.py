@@ -0,0 +1,155 @@
+"""
+Index declarations for every collection the app reads, plus query-plan checks.
+
+The API ensures these indexes exist at startup (disable with
+``MONGO_ENSURE_INDEXES=false``). They can also be managed from the backend
+directory:
+
+    python -m controller.indexes ensure
+    python -m controller.indexes diagnose
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from controller.technical_analysis.history_query import build_history_pipeline
+from controller.technical_analysis.history_store import BUCKET_COLLECTION, bucket_query
+
+SNAPSHOT_COLLECTIONS = ["financial_reports", "fundamental_analysis", "technical_analysis", "stonk_history"]
+
+# Required indexes per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    # Every snapshot read is "newest document by timestamp"
+    **{name: [IndexModel([("timestamp", DESCENDING)])] for name in SNAPSHOT_COLLECTIONS},
+    # One bucket per symbol and month; also serves symbol + month range reads
+    BUCKET_COLLECTION: [IndexModel([("symbol", ASCENDING), ("month", ASCENDING)], unique=True)],
+}
+
+# Plan stages that mean the query does not use an index properly
+FLAGGED_STAGES = {"COLLSCAN", "SORT"}
+
+
+def ensure_indexes(db, collections: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    """Create any missing indexes (idempotent). Returns the index names per collection."""
+    created = {}
+    for name in collections or INDEXES:
+        created[name] = db[name].create_indexes(INDEXES[name])
+    return created
+
+
+def hot_queries() -> List[Dict[str, Any]]:
+    """The queries the API runs on every request, in a form that can be explained"""
+    queries = []
+    for name in SNAPSHOT_COLLECTIONS:
+        queries.append({
+            "name": f"{name}: latest snapshot",
+            "collection": name,
+            "find": {"filter": {}, "sort": [("timestamp", DESCENDING)], "limit": 1},
+        })
+        queries.append({
+            "name": f"{name}: latest snapshot metadata",
+            "collection": name,
+            "find": {"filter": {}, "projection": {"_id": 1, "timestamp": 1, "storage": 1},
+                     "sort": [("timestamp", DESCENDING)], "limit": 1},
+        })
+    queries.append({
+        "name": "stonk_history: legacy per-symbol history",
+        "collection": "stonk_history",
+        "aggregate": build_history_pipeline("AAPL", date.today() - timedelta(days=30)),
+    })
+    queries.append({
+        "name": f"{BUCKET_COLLECTION}: per-symbol history",
+        "collection": BUCKET_COLLECTION,
+        "find": {"filter": bucket_query(["AAPL"], date.today() - timedelta(days=365)),
+                 "sort": [("symbol", ASCENDING), ("month", ASCENDING)]},
+    })
+    return queries
+
+
+def plan_stages(explain: Any) -> List[str]:
+    """All stage names found in the winning plan(s) of an explain() result"""
+    stages = []
+
+    def collect(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.append(node["stage"])
+            for value in node.values():
+                collect(value)
+        elif isinstance(node, list):
+            for value in node:
+                collect(value)
+
+    def find_winning_plans(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in ("winningPlan", "queryPlan"):
+                    collect(value)
+                else:
+                    find_winning_plans(value)
+        elif isinstance(node, list):
+            for value in node:
+                find_winning_plans(value)
+
+    find_winning_plans(explain)
+    return stages
+
+
+def explain_query(db, query: Dict[str, Any]) -> Dict[str, Any]:
+    collection = db[query["collection"]]
+    if "aggregate" in query:
+        return db.command("aggregate", query["collection"], pipeline=query["aggregate"], explain=True)
+    spec = query["find"]
+    cursor = collection.find(spec["filter"], spec.get("projection"))
+    if spec.get("sort"):
+        cursor = cursor.sort(spec["sort"])
+    if spec.get("limit"):
+        cursor = cursor.limit(spec["limit"])
+    return cursor.explain()
+
+
+def diagnose(db) -> List[Dict[str, Any]]:
+    """Explain every hot query and report the plan stages and any flagged ones"""
+    report = []
+    for query in hot_queries():
+        stages = plan_stages(explain_query(db, query))
+        report.append({
+            "name": query["name"],
+            "stages": stages,
+            "flagged": sorted(FLAGGED_STAGES.intersection(stages)),
+        })
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes and check query plans")
+    parser.add_argument("command", choices=["ensure", "diagnose"])
+    parsed = parser.parse_args(args)
+
+    from controller.mongodb import MongoDB
+
+    mongodb = MongoDB(db_name="PeliCanStonks")
+    try:
+        mongodb.connect()
+        if parsed.command == "ensure":
+            for name, index_names in ensure_indexes(mongodb.db).items():
+                print(f"✅ {name}: {', '.join(index_names)}")
+            return 0
+
+        problems = 0
+        for entry in diagnose(mongodb.db):
+            if entry["flagged"]:
+                problems += 1
+                print(f"❌ {entry['name']}: {' -> '.join(entry['stages'])} (flagged: {', '.join(entry['flagged'])})")
+            else:
+                print(f"✅ {entry['name']}: {' -> '.join(entry['stages'])}")
+        return 1 if problems else 0
+    finally:
+        mongodb.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
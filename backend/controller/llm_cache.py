@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from controller.file_io import atomic_write
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "data" / "llm_cache"
+
+
+class LLMCache:
+    """
+    Persistent cache of parsed LLM responses.
+
+    Entries are content-addressed: the key is a SHA-256 of the final prompt
+    (which already holds the normalized, rounded input data), the prompt
+    template version, the model name and the generation config. Each entry is
+    one JSON file under ``root``, so results survive restarts and are shared
+    by the API and the command-line pipelines.
+
+    Entries expire after ``ttl_seconds``; once ``max_entries`` is exceeded the
+    oldest entries are deleted.
+    """
+
+    def __init__(self, root: Optional[os.PathLike] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None, enabled: Optional[bool] = None):
+        self.root = Path(root or os.getenv("LLM_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("LLM_CACHE_TTL_SECONDS", 86400))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512))
+        self.enabled = enabled if enabled is not None else os.getenv("LLM_CACHE_ENABLED", "true").lower() != "false"
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(prompt: str, model_name: str, prompt_version: str,
+            generation_config: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps(
+            {
+                "prompt": prompt,
+                "prompt_version": prompt_version,
+                "model": model_name,
+                "generation_config": generation_config or {},
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for a key, or None if it is missing or expired"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if entry.get("created_at", 0) + self.ttl_seconds <= time.time():
+            with self._lock:
+                self.misses += 1
+                self.expired += 1
+            path.unlink(missing_ok=True)
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry.get("value")
+
+    def put(self, key: str, value: Any, model_name: Optional[str] = None) -> None:
+        """Store a value, then evict the oldest entries beyond ``max_entries``"""
+        if not self.enabled:
+            return
+        entry = {"created_at": time.time(), "model": model_name, "value": value}
+        with self._lock:
+            atomic_write(self._path(key), lambda f: json.dump(entry, f, default=str), binary=False)
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = list(self.root.glob("*.json"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: path.stat().st_mtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            path.unlink(missing_ok=True)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Delete every cached entry"""
+        with self._lock:
+            for path in self.root.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of entries"""
+        with self._lock:
+            size = len(list(self.root.glob("*.json"))) if self.root.exists() else 0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+
+
+# Process-wide cache shared by the forecast and fundamental analysis pipelines
+llm_cache = LLMCache()
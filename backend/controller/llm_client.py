@@ -0,0 +1,138 @@
+"""
+Async Gemini client shared by the forecast and fundamental analysis pipelines.
+
+Calls go through ``generate_content_async`` behind a semaphore, so many
+requests can be in flight without exceeding ``LLM_MAX_CONCURRENCY``. Rate
+limits are handled collectively: one ``ResourceExhausted`` pauses every caller
+of the client for the advised delay, instead of each caller sleeping and
+retrying on its own.
+
+The SDK's async transport and the cached model handles are bound to the event
+loop they were first used on, while each pipeline run starts its own loop with
+``asyncio.run``. All SDK calls therefore run on one long-lived loop in a
+background thread, and callers on any loop await them from there.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import google.api_core.exceptions
+
+from controller.providers import get_gemini_model
+
+# Requests in flight at once across the process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+# Pause after a rate limit that does not advise a delay
+DEFAULT_RETRY_DELAY = 10
+
+
+def retry_delay_seconds(error: Exception, default: float = DEFAULT_RETRY_DELAY) -> float:
+    """Delay advised by a ResourceExhausted error, if it carries one"""
+    if hasattr(error, 'retry_delay') and hasattr(error.retry_delay, 'seconds'):
+        return error.retry_delay.seconds
+    return default
+
+
+class AsyncLLMClient:
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        # Loop owning every SDK call, started on first use
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+        self.calls = 0
+        self.rate_limited = 0
+
+    def _client_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                self._loop = loop
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            return self._loop
+
+    def pause(self, delay: float) -> None:
+        """Hold back every caller for ``delay`` seconds from now"""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    async def wait_for_backoff(self) -> None:
+        """Return once no rate-limit pause is in effect"""
+        while True:
+            remaining = self._resume_at - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def paused(self) -> bool:
+        """Whether a rate-limit pause is in effect"""
+        return self._resume_at > time.monotonic()
+
+    async def generate(self, model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       max_retries: int = 3, fail_fast: bool = False) -> str:
+        """
+        Text of a Gemini response. A rate limit pauses all callers for the
+        advised delay and the request is retried, up to ``max_retries`` attempts;
+        the last ResourceExhausted is raised. Other errors propagate immediately.
+        With ``fail_fast`` a rate limit, or a pause already in effect, raises
+        ResourceExhausted at once instead of waiting. Can be awaited from any
+        event loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate(model_name, prompt, generation_config, max_retries, fail_fast), self._client_loop()
+        )
+        # Cancelling the caller cancels the request on the client loop too
+        return await asyncio.wrap_future(future)
+
+    def _raise_if_paused(self, model_name: str) -> None:
+        if self.paused():
+            raise google.api_core.exceptions.ResourceExhausted(
+                f"Gemini requests are paused after a rate limit; not calling {model_name}"
+            )
+
+    async def _generate(self, model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]],
+                        max_retries: int, fail_fast: bool) -> str:
+        attempt = 0
+        while True:
+            if fail_fast:
+                self._raise_if_paused(model_name)
+            await self.wait_for_backoff()
+            async with self._semaphore:
+                # A pause may have started while we waited for a slot
+                if fail_fast:
+                    self._raise_if_paused(model_name)
+                await self.wait_for_backoff()
+                try:
+                    model = get_gemini_model(model_name)
+                    self.calls += 1
+                    if generation_config is None:
+                        response = await model.generate_content_async(prompt)
+                    else:
+                        response = await model.generate_content_async(prompt, generation_config=generation_config)
+                    return response.text
+                except google.api_core.exceptions.ResourceExhausted as e:
+                    self.rate_limited += 1
+                    retry_delay = retry_delay_seconds(e)
+                    self.pause(retry_delay)
+                    attempt += 1
+                    if fail_fast or attempt >= max_retries:
+                        print(f"Rate limit exceeded for model {model_name}")
+                        raise
+                    print(f"Rate limit exceeded. Pausing all Gemini requests for {retry_delay} seconds...")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "max_concurrency": self.max_concurrency,
+            "paused_for": max(0.0, self._resume_at - time.monotonic()),
+        }
+
+
+# Process-wide client so every pipeline shares the same backoff
+llm_client = AsyncLLMClient()
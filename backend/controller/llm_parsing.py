@@ -0,0 +1,255 @@
+"""
+Tolerant parsing of Gemini responses into the forecast and recommendation schemas.
+
+Responses are validated with Pydantic models after repairing the usual
+defects: code fences, text after the JSON, output cut off mid-array, trailing
+commas, and numbers sent as strings or floats. Valid parts are kept and the
+parsers report what is still missing, so callers can ask the model for just
+that instead of regenerating the whole answer.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+FORECAST_DAYS = 30
+FORECAST_FIELDS = ["weekly_forecast", "recommendation", "confidence_level", "reasoning"]
+
+# Cut points tried when closing truncated JSON, newest first
+MAX_REPAIR_ATTEMPTS = 50
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# Valid values for every required forecast field, so one field can be validated on its own
+_PLACEHOLDER_FORECAST = {"weekly_forecast": [], "recommendation": "", "confidence_level": 0, "reasoning": ""}
+
+
+def _number(value: Any) -> Any:
+    """Accept numbers sent as strings, e.g. "1,234.5" or "$12.30" """
+    if isinstance(value, str):
+        cleaned = value.strip().replace(",", "").replace("$", "").rstrip("%")
+        try:
+            return float(cleaned)
+        except ValueError:
+            return value
+    return value
+
+
+class ForecastDay(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    day: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    trade_count: int
+    vwap: float
+
+    @field_validator("open", "high", "low", "close", "vwap", mode="before")
+    @classmethod
+    def _coerce_price(cls, value):
+        return _number(value)
+
+    @field_validator("volume", "trade_count", mode="before")
+    @classmethod
+    def _coerce_count(cls, value):
+        value = _number(value)
+        return round(value) if isinstance(value, float) else value
+
+
+class StockForecast(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    weekly_forecast: List[ForecastDay]
+    recommendation: str
+    confidence_level: float
+    reasoning: str
+
+    @field_validator("confidence_level", mode="before")
+    @classmethod
+    def _coerce_confidence(cls, value):
+        # "85%" or 85 on a 0-1 scale
+        number = _number(value)
+        if isinstance(number, (int, float)) and number > 1:
+            return number / 100
+        return number
+
+
+class TickerRecommendation(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    ticker: str
+    recommendation: str
+    confidence: str
+    pro: str
+    con: str
+    summary: str
+
+    @field_validator("ticker")
+    @classmethod
+    def _normalize_ticker(cls, value):
+        return value.strip().upper()
+
+
+def _strip_fences(text: str) -> str:
+    """Content of the first code fence; an unclosed fence (cut-off output) runs to the end"""
+    match = re.search(r"```(?:json|JSON)?\s*\n?", text)
+    if not match:
+        return text
+    body = text[match.end():]
+    end = body.find("```")
+    return body if end == -1 else body[:end]
+
+
+def _close_truncated(text: str) -> Optional[Any]:
+    """
+    Parse JSON that was cut off: drop the incomplete tail after the last fully
+    closed object/array and close whatever is still open.
+    """
+    stack: List[str] = []
+    cut_points: List[Tuple[int, str]] = []
+    in_string = False
+    escaped = False
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not stack:
+                break
+            stack.pop()
+            cut_points.append((position + 1, "".join(reversed(stack))))
+            if not stack:
+                break
+
+    for cut, closers in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        candidate = _TRAILING_COMMA.sub(r"\1", text[:cut].rstrip().rstrip(",") + closers)
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def extract_json(text: str) -> Any:
+    """
+    First JSON object or array in a response, ignoring fences and trailing
+    text and repairing trailing commas and truncation. Raises ValueError if
+    nothing can be recovered.
+    """
+    body = _strip_fences(text or "")
+    starts = [position for position in (body.find("{"), body.find("[")) if position != -1]
+    if not starts:
+        raise ValueError("No JSON found in response")
+    body = body[min(starts):]
+
+    decoder = json.JSONDecoder()
+    for candidate in (body, _TRAILING_COMMA.sub(r"\1", body)):
+        try:
+            value, _ = decoder.raw_decode(candidate)
+            return value
+        except ValueError:
+            pass
+
+    value = _close_truncated(body)
+    if value is None:
+        raise ValueError("Response is not valid JSON and could not be repaired")
+    return value
+
+
+def _errors(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+
+
+def parse_forecast(text: str, days: int = FORECAST_DAYS) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Parse a forecast response. Returns the valid part of the forecast and the
+    fields still missing; ``weekly_forecast`` counts as missing while fewer
+    than ``days`` valid days are present (extra days are dropped).
+    """
+    parsed = extract_json(text)
+    if not isinstance(parsed, dict):
+        raise ValueError("Forecast response is not a JSON object")
+    return merge_forecast({}, parsed, days)
+
+
+def merge_forecast(forecast: Dict[str, Any], update: Dict[str, Any],
+                   days: int = FORECAST_DAYS) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Add the valid fields of ``update`` (e.g. the answer to a follow-up) to
+    ``forecast``. New forecast days are appended after the days already present.
+    """
+    merged = dict(forecast)
+    for key, value in update.items():
+        if key == "weekly_forecast" or key in merged:
+            continue
+        # Validate each top-level field on its own so one bad field doesn't discard the rest
+        if key in StockForecast.model_fields:
+            try:
+                merged[key] = getattr(StockForecast.model_validate({**_PLACEHOLDER_FORECAST, key: value}), key)
+            except ValidationError as e:
+                print(f"Dropping invalid '{key}' from forecast: {_errors(e)}")
+        else:
+            merged[key] = value
+
+    existing_days = list(merged.get("weekly_forecast", []))
+    seen = {day["day"] for day in existing_days}
+    for raw_day in update.get("weekly_forecast") or []:
+        try:
+            day = ForecastDay.model_validate(raw_day).model_dump()
+        except ValidationError as e:
+            print(f"Dropping invalid forecast day: {_errors(e)}")
+            continue
+        if day["day"] not in seen:
+            seen.add(day["day"])
+            existing_days.append(day)
+    merged["weekly_forecast"] = existing_days[:days]
+
+    missing = [field for field in FORECAST_FIELDS if field != "weekly_forecast" and field not in merged]
+    if len(merged["weekly_forecast"]) < days:
+        missing.insert(0, "weekly_forecast")
+    return merged, missing
+
+
+def parse_recommendations(text: str, tickers: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Parse a recommendations response. Returns the valid recommendations for
+    the requested tickers (in ticker order) and the tickers still missing.
+    """
+    parsed = extract_json(text)
+    if isinstance(parsed, dict):
+        entries = parsed.get("recommendations", [])
+    elif isinstance(parsed, list):
+        entries = parsed
+    else:
+        raise ValueError("Recommendations response is not a JSON object")
+    if not isinstance(entries, list):
+        raise ValueError("'recommendations' is not a list")
+
+    wanted = {ticker.upper(): ticker for ticker in tickers}
+    found: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        try:
+            recommendation = TickerRecommendation.model_validate(entry).model_dump()
+        except ValidationError as e:
+            print(f"Dropping invalid recommendation: {_errors(e)}")
+            continue
+        ticker = recommendation["ticker"]
+        if ticker in wanted and ticker not in found:
+            recommendation["ticker"] = wanted[ticker]
+            found[ticker] = recommendation
+
+    recommendations = [found[ticker.upper()] for ticker in tickers if ticker.upper() in found]
+    missing = [ticker for ticker in tickers if ticker.upper() not in found]
+    return recommendations, missing
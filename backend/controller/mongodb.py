@@ -1,5 +1,8 @@
 import os
+import asyncio
 import certifi
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pymongo import MongoClient
 from datetime import datetime
 from dotenv import load_dotenv
@@ -7,7 +10,7 @@ from pathlib import Path
 from typing import Optional, Dict, List, Any
 
 class MongoDB:
-    def __init__(self, db_name: str = "PeliCanStonks"):
+    def __init__(self, db_name: str = "PeliCanStonks", **client_options):
         # Load .env
         env_path = Path(__file__).parent.parent / '.env'
         load_dotenv(dotenv_path=env_path)
@@ -19,6 +22,19 @@ class MongoDB:
         self.client = None
         self.db_name = db_name
         self.db = None
+
+        # Connection pool settings. The client is meant to be long-lived (one per
+        # worker process), so these bound how many sockets it keeps and how long
+        # a request waits before giving up on the cluster.
+        self.client_options = {
+            "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+            "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+            "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000)),
+            "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+            "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+            "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000)),
+        }
+        self.client_options.update(client_options)
     
     def connect(self) -> None:
         """Connect to MongoDB"""
@@ -26,7 +42,8 @@ class MongoDB:
             self.client = MongoClient(
                 self.mongo_uri,
                 tls=True,
-                tlsCAFile=certifi.where()
+                tlsCAFile=certifi.where(),
+                **self.client_options
             )
             self.db = self.client[self.db_name]
             # Test connection
@@ -35,6 +52,10 @@ class MongoDB:
                 print(f"✅ MongoDB connection successful (ping passed). Connected to {self.db_name}.")
             except Exception as e:
                 print(f"❌ MongoDB connection failed: {e}")
+                # Leave no half-open client behind, so the next call connects again
+                self.client.close()
+                self.client = None
+                self.db = None
                 raise
     
     def disconnect(self) -> None:
@@ -68,6 +89,18 @@ class MongoDB:
             query = {}
         return collection.find_one(query)
     
+    def fetch_latest(self, collection_name: str, query: Dict = None, projection: Dict = None) -> Optional[Dict[str, Any]]:
+        """Fetch the most recent document (by timestamp) from a collection"""
+        collection = self.get_collection(collection_name)
+        if query is None:
+            query = {}
+        return collection.find_one(query, projection, sort=[("timestamp", -1)])
+    
+    def aggregate(self, collection_name: str, pipeline: List[Dict]) -> List[Dict[str, Any]]:
+        """Run an aggregation pipeline on a collection"""
+        collection = self.get_collection(collection_name)
+        return list(collection.aggregate(pipeline))
+    
     def insert_one(self, collection_name: str, document: Dict) -> str:
         """Insert a document into a collection"""
         collection = self.get_collection(collection_name)
@@ -93,6 +126,76 @@ class MongoDB:
         return result.deleted_count
 
 
+class AsyncMongoDB:
+    """
+    Awaitable wrapper around MongoDB for use inside async route handlers.
+
+    Every call is run on a dedicated thread pool so blocking pymongo I/O never
+    stalls the event loop. The wrapped client (and its connection pool) is
+    shared, so the pool size of the sync client still bounds open sockets.
+    """
+
+    def __init__(self, mongodb: MongoDB, max_workers: Optional[int] = None):
+        self.mongodb = mongodb
+        self.max_workers = max_workers or int(os.getenv("MONGO_ASYNC_WORKERS", 16))
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="mongodb"
+            )
+        return self._executor
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+
+    async def connect(self) -> None:
+        """Connect to MongoDB"""
+        await self._run(self.mongodb.connect)
+
+    async def disconnect(self) -> None:
+        """Close MongoDB connection and shut down the worker threads"""
+        await self._run(self.mongodb.disconnect)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def fetch_data(self, collection_name: str, query: Dict = None, projection: Dict = None) -> List[Dict[str, Any]]:
+        """Fetch documents from a collection based on query"""
+        return await self._run(self.mongodb.fetch_data, collection_name, query, projection)
+
+    async def fetch_one(self, collection_name: str, query: Dict = None) -> Optional[Dict[str, Any]]:
+        """Fetch a single document from a collection based on query"""
+        return await self._run(self.mongodb.fetch_one, collection_name, query)
+
+    async def fetch_latest(self, collection_name: str, query: Dict = None, projection: Dict = None) -> Optional[Dict[str, Any]]:
+        """Fetch the most recent document (by timestamp) from a collection"""
+        return await self._run(self.mongodb.fetch_latest, collection_name, query, projection)
+
+    async def aggregate(self, collection_name: str, pipeline: List[Dict]) -> List[Dict[str, Any]]:
+        """Run an aggregation pipeline on a collection"""
+        return await self._run(self.mongodb.aggregate, collection_name, pipeline)
+
+    async def insert_one(self, collection_name: str, document: Dict) -> str:
+        """Insert a document into a collection"""
+        return await self._run(self.mongodb.insert_one, collection_name, document)
+
+    async def insert_many(self, collection_name: str, documents: List[Dict]) -> List[str]:
+        """Insert multiple documents into a collection"""
+        return await self._run(self.mongodb.insert_many, collection_name, documents)
+
+    async def update_one(self, collection_name: str, query: Dict, update: Dict, upsert: bool = False) -> int:
+        """Update a document in a collection"""
+        return await self._run(self.mongodb.update_one, collection_name, query, update, upsert)
+
+    async def delete_one(self, collection_name: str, query: Dict) -> int:
+        """Delete a document from a collection"""
+        return await self._run(self.mongodb.delete_one, collection_name, query)
+
+
 # Example usage
 if __name__ == "__main__":
     # Initialize MongoDB connection
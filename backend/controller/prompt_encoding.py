@@ -0,0 +1,148 @@
+"""
+Compact encoders for the data embedded in LLM prompts.
+
+Both pipelines used to paste padded tables (``DataFrame.to_string``) and
+indented JSON into their prompts. The encoders here produce the same
+information with far fewer tokens, and the ``fit_*`` helpers shrink it further
+until the prompt fits the configured token budget.
+"""
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# Rough input token budget per prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 8000))
+# Average characters per token for the numeric/CSV/JSON text we send
+CHARS_PER_TOKEN = 4
+
+BAR_COLUMNS = ["open", "high", "low", "close", "volume", "trade_count", "vwap"]
+# Daily bars kept at full resolution when older bars have to be downsampled, in order of preference
+RECENT_ROW_STEPS = [None, 120, 60, 30]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, offline estimate of the token count of a prompt"""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def log_prompt_size(label: str, prompt: str, token_budget: Optional[int] = None) -> int:
+    """Print the estimated size of a prompt before it is sent and return the token estimate"""
+    tokens = estimate_tokens(prompt)
+    budget = token_budget or PROMPT_TOKEN_BUDGET
+    status = "within" if tokens <= budget else "OVER"
+    print(f"Prompt for {label}: {len(prompt)} chars, ~{tokens} tokens ({status} budget of {budget})")
+    return tokens
+
+
+def _downsample_weekly(bars: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate daily bars into weekly bars labelled by the last trading day of the week"""
+    weekly = bars.set_index("timestamp", drop=False).resample("W")
+    aggregated = pd.DataFrame({
+        # Label each week by its last trading day rather than the calendar week end
+        "timestamp": weekly["timestamp"].last(),
+        "open": weekly["open"].first(),
+        "high": weekly["high"].max(),
+        "low": weekly["low"].min(),
+        "close": weekly["close"].last(),
+        "volume": weekly["volume"].sum(),
+        "trade_count": weekly["trade_count"].sum(),
+        "vwap": weekly["vwap"].mean(),
+    })
+    return aggregated.dropna(subset=["close"]).reset_index(drop=True)
+
+
+def encode_bars_csv(stock_bars: pd.DataFrame, precision: int = 2, recent_rows: Optional[int] = None) -> str:
+    """
+    Encode bars as CSV with rounded prices and a plain date column.
+
+    If ``recent_rows`` is given, only the newest ``recent_rows`` daily bars are
+    kept as-is and older bars are downsampled to weekly bars.
+    """
+    bars = stock_bars.reset_index()
+    bars = bars[["timestamp"] + [column for column in BAR_COLUMNS if column in bars.columns]]
+    bars = bars.sort_values("timestamp").reset_index(drop=True)
+
+    if recent_rows is not None and len(bars) > recent_rows:
+        older = _downsample_weekly(bars.iloc[:-recent_rows])
+        bars = pd.concat([older, bars.iloc[-recent_rows:]], ignore_index=True)
+
+    bars["timestamp"] = pd.to_datetime(bars["timestamp"]).dt.strftime("%Y-%m-%d")
+    bars = bars.rename(columns={"timestamp": "date"})
+    for column in ("volume", "trade_count"):
+        if column in bars:
+            bars[column] = bars[column].round().astype("int64")
+    price_columns = [column for column in ("open", "high", "low", "close", "vwap") if column in bars]
+    bars[price_columns] = bars[price_columns].round(precision)
+    return bars.to_csv(index=False, lineterminator="\n")
+
+
+def fit_bars_to_budget(stock_bars: pd.DataFrame, token_budget: int, precision: int = 2,
+                       max_recent_rows: Optional[int] = None) -> str:
+    """
+    Encode bars as CSV, downsampling progressively more of the older history
+    to weekly bars until the encoding fits ``token_budget``. ``max_recent_rows``
+    downsamples everything older than that many bars even if it would fit.
+    """
+    steps = RECENT_ROW_STEPS
+    if max_recent_rows is not None:
+        steps = [max_recent_rows] + [step for step in RECENT_ROW_STEPS if step is not None and step < max_recent_rows]
+    encoded = ""
+    for recent_rows in steps:
+        encoded = encode_bars_csv(stock_bars, precision=precision, recent_rows=recent_rows)
+        if estimate_tokens(encoded) <= token_budget:
+            break
+    return encoded
+
+
+def _compact_value(value: Any, precision: int) -> Any:
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return None
+        if value.is_integer():
+            return int(value)
+        return round(value, precision)
+    if isinstance(value, dict):
+        compacted = {key: _compact_value(item, precision) for key, item in value.items()}
+        return {key: item for key, item in compacted.items() if item not in (None, {}, [])}
+    if isinstance(value, list):
+        return [_compact_value(item, precision) for item in value]
+    return value
+
+
+def compact_json(data: Any, precision: int = 4) -> str:
+    """
+    JSON without whitespace, with integral floats written as integers, other
+    floats rounded and null/empty values dropped.
+    """
+    return json.dumps(_compact_value(data, precision), separators=(",", ":"), ensure_ascii=False)
+
+
+def _shrink_news(data: Dict[str, Any], summary_chars: Optional[int]) -> Dict[str, Any]:
+    """Copy of a fundamentals dataset with news urls dropped and summaries truncated (or removed)"""
+    shrunk = {}
+    for ticker, entry in data.items():
+        news: List[Dict[str, Any]] = []
+        for article in entry.get("news", []):
+            compact_article = {"headline": article.get("headline")}
+            if summary_chars is None or summary_chars > 0:
+                summary = article.get("summary") or ""
+                compact_article["summary"] = summary if summary_chars is None else summary[:summary_chars]
+            news.append(compact_article)
+        shrunk[ticker] = {**entry, "news": news}
+    return shrunk
+
+
+def fit_dataset_to_budget(data: Dict[str, Any], token_budget: int) -> str:
+    """
+    Compact JSON of a fundamentals dataset that fits ``token_budget``: news
+    urls are always dropped, then summaries are shortened and finally removed.
+    """
+    encoded = ""
+    for summary_chars in (None, 200, 0):
+        encoded = compact_json(_shrink_news(data, summary_chars))
+        if estimate_tokens(encoded) <= token_budget:
+            break
+    return encoded
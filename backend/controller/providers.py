@@ -0,0 +1,132 @@
+"""
+Process-wide registry of external provider clients.
+
+Clients (Alpaca data clients, the configured Gemini SDK and its model handles)
+are created lazily on first use and then shared by every thread of the
+process, so per-symbol code never pays the setup cost again.
+
+Tests can swap in local fakes:
+
+    with providers.override("alpaca_news", FakeNewsClient()):
+        fetch_news("AAPL")
+"""
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Load .env
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(dotenv_path=env_path)
+
+_MISSING = object()
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        # Re-entrant so a factory can depend on another provider
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Register (or replace) the factory for a provider and drop its cached instance"""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str, factory: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Return the shared instance of a provider, creating it on first use.
+        ``factory`` registers the provider if it is not known yet.
+        """
+        instance = self._instances.get(name, _MISSING)
+        if instance is not _MISSING:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name, _MISSING)
+            if instance is _MISSING:
+                if name not in self._factories:
+                    if factory is None:
+                        raise KeyError(f"Unknown provider: {name}")
+                    self._factories[name] = factory
+                instance = self._factories[name]()
+                self._instances[name] = instance
+            return instance
+
+    def set(self, name: str, instance: Any) -> None:
+        """Use ``instance`` for a provider (e.g. a fake in tests)"""
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Drop cached instances so they are recreated on next use"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    @contextmanager
+    def override(self, name: str, instance: Any):
+        """Temporarily replace a provider instance"""
+        with self._lock:
+            previous = self._instances.get(name, _MISSING)
+            self._instances[name] = instance
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                if previous is _MISSING:
+                    self._instances.pop(name, None)
+                else:
+                    self._instances[name] = previous
+
+
+def _alpaca_keys():
+    api_key = os.getenv("ALPACA_API_KEY_ID")
+    secret_key = os.getenv("ALPACA_API_SECRET_KEY")
+    if not api_key or not secret_key:
+        raise RuntimeError(f"Alpaca API Keys missing in .env file at {env_path}")
+    return api_key, secret_key
+
+
+def _create_alpaca_bars_client():
+    from alpaca.data.historical import StockHistoricalDataClient
+
+    api_key, secret_key = _alpaca_keys()
+    return StockHistoricalDataClient(api_key=api_key, secret_key=secret_key)
+
+
+def _create_alpaca_news_client():
+    from alpaca.data.historical.news import NewsClient
+
+    api_key, secret_key = _alpaca_keys()
+    return NewsClient(api_key=api_key, secret_key=secret_key)
+
+
+def _configure_gemini():
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError(f"Gemini API key missing in .env file at {env_path}")
+    genai.configure(api_key=api_key)
+    return genai
+
+
+providers = ProviderRegistry()
+providers.register("alpaca_bars", _create_alpaca_bars_client)
+providers.register("alpaca_news", _create_alpaca_news_client)
+providers.register("gemini", _configure_gemini)
+
+
+def get_gemini_model(model_name: str):
+    """Shared GenerativeModel handle for a model name (configures the SDK once)"""
+    return providers.get(
+        f"gemini_model:{model_name}",
+        lambda: providers.get("gemini").GenerativeModel(model_name)
+    )
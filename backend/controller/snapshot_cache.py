@@ -0,0 +1,135 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Sentinel so that a cached ``None`` (empty collection) still counts as a hit
+_MISSING = object()
+
+
+class SnapshotCache:
+    """
+    In-process cache for the "latest snapshot" documents served by /stocks.
+
+    Keys are tuples whose first element is the collection name, e.g.
+    ``("stonk_history", "AAPL")``, so a write to a collection can drop every
+    variant cached for it. Entries expire after ``ttl_seconds`` and the least
+    recently used entry is evicted once ``max_entries`` is reached.
+
+    Concurrent misses on the same key are coalesced: the first caller starts
+    the load and everyone else awaits the same task, so only one query runs.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("SNAPSHOT_CACHE_TTL_SECONDS", 300))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SNAPSHOT_CACHE_MAX_ENTRIES", 256))
+
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        # Writers invalidate from pipeline threads, readers run on the event loop
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _generation(self, collection_name: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(collection_name, 0)
+
+    def _lookup(self, key: Tuple) -> Tuple[Any, Tuple[int, int]]:
+        """Return (value or _MISSING, current generation of the key's collection)"""
+        with self._lock:
+            generation = self._generation(key[0])
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING, generation
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING, generation
+            self._entries.move_to_end(key)
+            return value, generation
+
+    def _store(self, key: Tuple, value: Any, generation: Tuple[int, int]) -> None:
+        with self._lock:
+            # The collection was written to while we were loading; the value
+            # we have may already be stale, so don't cache it.
+            if self._generation(key[0]) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Tuple, default: Any = None) -> Any:
+        """Return a cached value without loading it"""
+        value, _ = self._lookup(key)
+        return default if value is _MISSING else value
+
+    async def get_or_load(self, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for ``key``, loading it with ``loader`` on a miss.
+
+        The returned value is shared between callers and must not be mutated.
+        """
+        value, generation = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        inflight_key = (key, generation)
+        task = self._inflight.get(inflight_key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, generation))
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda t: self._finish(inflight_key, t))
+
+        # Shield the shared load so one cancelled request doesn't cancel it for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Tuple, loader: Callable[[], Awaitable[Any]], generation: Tuple[int, int]) -> Any:
+        value = await loader()
+        self._store(key, value, generation)
+        return value
+
+    def _finish(self, inflight_key: Tuple, task: asyncio.Task) -> None:
+        if self._inflight.get(inflight_key) is task:
+            del self._inflight[inflight_key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        """Drop every cached entry for a collection (or everything if no name is given)"""
+        with self._lock:
+            if collection_name is None:
+                self._epoch += 1
+                self._entries.clear()
+                return
+            self._generations[collection_name] = self._generations.get(collection_name, 0) + 1
+            for key in [key for key in self._entries if key[0] == collection_name]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of entries"""
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+
+
+# Process-wide cache shared by the API routes and the pipelines that write snapshots
+snapshot_cache = SnapshotCache()
@@ -1,17 +1,19 @@
 import os
 from dotenv import load_dotenv
-from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.data.requests import StockBarsRequest
 from alpaca.data.timeframe import TimeFrame
 
+from controller.providers import providers
+
 load_dotenv()
 
-# Create Alpaca client
+# Symbols per bars request. Alpaca pages through the bars of a request itself,
+# this only keeps the query string of very large universes reasonably short.
+SYMBOLS_PER_REQUEST = int(os.getenv("ALPACA_SYMBOLS_PER_REQUEST", 100))
+
+# Get the shared Alpaca client (created once per process)
 def create_alpaca_client():
-    return StockHistoricalDataClient(
-        api_key=os.getenv("ALPACA_API_KEY_ID"),
-        secret_key=os.getenv("ALPACA_API_SECRET_KEY"),
-    )
+    return providers.get("alpaca_bars")
 
 # Fetch historical stock bars
 def fetch_stock_data(alpaca_client, symbol: str, start_date: str, end_date: str):
@@ -21,4 +23,30 @@ def fetch_stock_data(alpaca_client, symbol: str, start_date: str, end_date: str)
         start=start_date,
         end=end_date,
     )
-    return alpaca_client.get_stock_bars(request_params).df
\ No newline at end of file
+    return alpaca_client.get_stock_bars(request_params).df
+
+# Fetch historical stock bars for many symbols at once
+def fetch_stock_data_batch(alpaca_client, symbols, start_date: str, end_date: str, symbols_per_request=None):
+    """
+    Fetch daily bars for all symbols in as few requests as possible and split
+    the multi-indexed result per symbol.
+    
+    Returns:
+        Dict mapping each symbol to its bars, indexed by (symbol, timestamp) just
+        like fetch_stock_data. Symbols without any bars are left out.
+    """
+    symbols_per_request = symbols_per_request or SYMBOLS_PER_REQUEST
+    bars_by_symbol = {}
+    for i in range(0, len(symbols), symbols_per_request):
+        request_params = StockBarsRequest(
+            symbol_or_symbols=list(symbols[i:i + symbols_per_request]),
+            timeframe=TimeFrame.Day,
+            start=start_date,
+            end=end_date,
+        )
+        bars = alpaca_client.get_stock_bars(request_params).df
+        if bars.empty:
+            continue
+        for symbol, symbol_bars in bars.groupby(level="symbol", sort=False):
+            bars_by_symbol[symbol] = symbol_bars
+    return bars_by_symbol
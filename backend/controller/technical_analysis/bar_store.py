@@ -0,0 +1,147 @@
+"""
+Incremental on-disk store of daily bars.
+
+Each symbol's bars live in ``<BAR_STORE_DIR>/<SYMBOL>.npy`` as a NumPy
+structured array sorted by timestamp. Files are opened memory-mapped, so
+reading a trailing window is a zero-copy slice, and an update only downloads
+the days after the last stored bar.
+"""
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from controller.file_io import atomic_write
+from controller.technical_analysis.alpaca_client import fetch_stock_data_batch
+
+BAR_FIELDS = ["open", "high", "low", "close", "volume", "trade_count", "vwap"]
+BAR_DTYPE = np.dtype([("timestamp", "<i8")] + [(field, "<f8") for field in BAR_FIELDS])
+
+DEFAULT_STORE_DIR = Path(__file__).parent.parent.parent / "data" / "bars"
+
+
+def _to_utc_nanoseconds(timestamps) -> np.ndarray:
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return np.asarray(index, dtype="datetime64[ns]").view("int64")
+
+
+def frame_to_array(bars: pd.DataFrame) -> np.ndarray:
+    """Convert an Alpaca bars frame (indexed by symbol, timestamp) to the stored layout"""
+    array = np.empty(len(bars), dtype=BAR_DTYPE)
+    array["timestamp"] = _to_utc_nanoseconds(bars.index.get_level_values("timestamp"))
+    for field in BAR_FIELDS:
+        array[field] = bars[field].to_numpy(dtype="float64") if field in bars.columns else np.nan
+    return np.sort(array, order="timestamp")
+
+
+def array_to_frame(symbol: str, array: np.ndarray) -> pd.DataFrame:
+    """Rebuild a bars frame in the same (symbol, timestamp) layout Alpaca returns"""
+    timestamps = pd.DatetimeIndex(array["timestamp"].view("datetime64[ns]")).tz_localize("UTC")
+    index = pd.MultiIndex.from_arrays([[symbol] * len(array), timestamps], names=["symbol", "timestamp"])
+    return pd.DataFrame({field: array[field] for field in BAR_FIELDS}, index=index)
+
+
+class BarStore:
+    def __init__(self, root: Optional[os.PathLike] = None):
+        self.root = Path(root or os.getenv("BAR_STORE_DIR") or DEFAULT_STORE_DIR)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> Path:
+        return self.root / f"{symbol}.npy"
+
+    def load(self, symbol: str) -> Optional[np.ndarray]:
+        """Memory-mapped bars of a symbol, or None if nothing is stored yet"""
+        path = self._path(symbol)
+        if not path.exists():
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        """Date of the newest stored bar"""
+        bars = self.load(symbol)
+        if bars is None or len(bars) == 0:
+            return None
+        return pd.Timestamp(int(bars["timestamp"][-1])).date()
+
+    def window(self, symbol: str, start: Optional[date] = None, end: Optional[date] = None) -> Optional[np.ndarray]:
+        """Bars between start and end (inclusive) as a zero-copy view of the stored file"""
+        bars = self.load(symbol)
+        if bars is None:
+            return None
+        timestamps = bars["timestamp"]
+        lo = np.searchsorted(timestamps, pd.Timestamp(start).value, side="left") if start else 0
+        hi = np.searchsorted(timestamps, pd.Timestamp(end + timedelta(days=1)).value, side="left") if end else len(bars)
+        return bars[lo:hi]
+
+    def read(self, symbol: str, start: Optional[date] = None, end: Optional[date] = None) -> Optional[pd.DataFrame]:
+        """Bars between start and end (inclusive) as a frame like fetch_stock_data returns"""
+        bars = self.window(symbol, start, end)
+        if bars is None:
+            return None
+        return array_to_frame(symbol, bars)
+
+    def append(self, symbol: str, bars: pd.DataFrame) -> int:
+        """
+        Merge new bars into the store. Newly fetched bars replace stored bars
+        with the same timestamp. Returns the number of stored bars.
+        """
+        new = frame_to_array(bars)
+        with self._lock:
+            existing = self.load(symbol)
+            if existing is not None and len(existing):
+                existing = existing[~np.isin(existing["timestamp"], new["timestamp"])]
+                merged = np.sort(np.concatenate([existing, new]), order="timestamp")
+            else:
+                merged = new
+            atomic_write(self._path(symbol), lambda f: np.save(f, merged))
+        return len(merged)
+
+    def update(self, alpaca_client, symbols: Iterable[str], end_date: date,
+               lookback_days: int = 365) -> Dict[str, pd.DataFrame]:
+        """
+        Download only the missing days for each symbol and return the trailing
+        ``lookback_days`` window ending at ``end_date`` from the store.
+        """
+        symbols = list(symbols)
+        window_start = end_date - timedelta(days=lookback_days)
+
+        # Group symbols by the first day they are missing so each gap is one batched request
+        gaps: Dict[date, List[str]] = {}
+        for symbol in symbols:
+            last = self.last_date(symbol)
+            fetch_from = max(last + timedelta(days=1), window_start) if last else window_start
+            if fetch_from <= end_date:
+                gaps.setdefault(fetch_from, []).append(symbol)
+
+        for fetch_from, missing in sorted(gaps.items()):
+            print(f"Fetching bars from {fetch_from} to {end_date} for {', '.join(missing)}")
+            fetched = fetch_stock_data_batch(
+                alpaca_client,
+                missing,
+                start_date=fetch_from.strftime("%Y-%m-%d"),
+                end_date=end_date.strftime("%Y-%m-%d")
+            )
+            for symbol, bars in fetched.items():
+                self.append(symbol, bars)
+
+        windows = {}
+        for symbol in symbols:
+            frame = self.read(symbol, window_start, end_date)
+            if frame is not None and not frame.empty:
+                windows[symbol] = frame
+        return windows
+
+
+bar_store = BarStore()
+
+
+if __name__ == "__main__":
+    for path in sorted(bar_store.root.glob("*.npy")):
+        symbol = path.stem
+        print(f"{symbol}: {len(bar_store.load(symbol))} bars, last bar on {bar_store.last_date(symbol)}")
@@ -6,6 +6,12 @@ from dotenv import load_dotenv
 from pathlib import Path
 import os
 
+from controller.indexes import ensure_indexes
+from controller.snapshot_cache import snapshot_cache
+from controller.technical_analysis.history_store import (
+    BUCKET_COLLECTION, BUCKET_STORAGE, snapshot_to_symbol_bars, upsert_history
+)
+
 # Load .env
 env_path = Path(__file__).parent.parent.parent / '.env'
 print(f"Looking for .env file at: {env_path}")
@@ -20,6 +26,7 @@ client = MongoClient(uri, server_api=ServerApi('1'))
 db = client["PeliCanStonks"]
 collection_forecast = db["technical_analysis"]
 collection_history = db["stonk_history"]
+collection_history_buckets = db[BUCKET_COLLECTION]
 
 def post_forecast(forecast_data):
     """
@@ -44,6 +51,7 @@ def post_forecast(forecast_data):
         }
     
     insert_result = collection_forecast.insert_one(document)
+    snapshot_cache.invalidate("technical_analysis")
     print(f"Inserted forecast with ID: {insert_result.inserted_id}")
     return insert_result.inserted_id
 
@@ -52,27 +60,36 @@ def post_history(history_data, symbol=None):
     """
     Save historical stock data to MongoDB
     
+    Bars are merged into the per-symbol, per-month bucket store and a small
+    marker document is added to stonk_history so readers know a new run landed.
+    
     Args:
         history_data: Either a dictionary mapping symbols to their history data,
                      or a list of history data points for a single symbol
         symbol: Stock symbol (optional, used for labeling the data if not already included)
     """
-    document = {
-        'timestamp': datetime.now()
-    }
-    
     # Check if we're dealing with a dictionary of symbols to data
     if isinstance(history_data, dict) and all(isinstance(v, list) for v in history_data.values()):
         # This is a dictionary of symbols to history data
-        document['stocks'] = history_data
+        symbol_bars = history_data
     else:
         # This is a list of history data for a single symbol
         if symbol and isinstance(history_data, list) and len(history_data) > 0 and 'symbol' not in history_data[0]:
             for record in history_data:
                 record['symbol'] = symbol
         
-        document['data'] = history_data
+        symbol_bars = snapshot_to_symbol_bars({'data': history_data})
     
+    ensure_indexes(db, [BUCKET_COLLECTION])
+    bucket_count = upsert_history(collection_history_buckets, symbol_bars)
+    print(f"Upserted {bucket_count} history buckets for {', '.join(symbol_bars)}")
+    
+    document = {
+        'timestamp': datetime.now(),
+        'storage': BUCKET_STORAGE,
+        'symbols': sorted(symbol_bars)
+    }
     insert_result = collection_history.insert_one(document)
+    snapshot_cache.invalidate("stonk_history")
     print(f"Inserted history with ID: {insert_result.inserted_id}")
-    return insert_result.inserted_id
\ No newline at end of file
+    return insert_result.inserted_id
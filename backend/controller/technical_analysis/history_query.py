@@ -0,0 +1,86 @@
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+# Symbols are only ever compared as values, never used as field paths, so dotted
+# class shares such as "BRK.B" are fine
+SYMBOL_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,15}$")
+
+
+def is_valid_symbol(symbol: str) -> bool:
+    return bool(SYMBOL_PATTERN.match(symbol))
+
+
+def _range_conditions(start: Optional[date], end: Optional[date]) -> List[Dict[str, Any]]:
+    """Bar timestamp bounds; ``end`` is inclusive of the whole day"""
+    conditions = []
+    if start:
+        conditions.append({"$gte": ["$$bar.timestamp", datetime.combine(start, time.min)]})
+    if end:
+        conditions.append({"$lt": ["$$bar.timestamp", datetime.combine(end + timedelta(days=1), time.min)]})
+    return conditions
+
+
+def _filter_bars(bars: Any, conditions: List[Dict[str, Any]]) -> Any:
+    """Aggregation expression keeping only the bars matching all conditions"""
+    bars = {"$ifNull": [bars, []]}
+    if not conditions:
+        return bars
+    return {"$filter": {"input": bars, "as": "bar", "cond": {"$and": conditions}}}
+
+
+def _filter_symbol_map(field: str, symbol: Optional[str], conditions: List[Dict[str, Any]]) -> Any:
+    """Expression for a ``{symbol: [bars]}`` field restricted to a symbol and/or date range"""
+    if not symbol and not conditions:
+        return f"${field}"
+    entries = {"$objectToArray": f"${field}"}
+    if symbol:
+        # Match the key as a value; "$field.BRK.B" would be read as a nested path
+        entries = {"$filter": {"input": entries, "as": "entry", "cond": {"$eq": ["$$entry.k", {"$literal": symbol}]}}}
+    return {
+        "$arrayToObject": {
+            "$map": {
+                "input": entries,
+                "as": "entry",
+                "in": {"k": "$$entry.k", "v": _filter_bars("$$entry.v", conditions)}
+            }
+        }
+    }
+
+
+def build_history_pipeline(symbol: Optional[str] = None, start: Optional[date] = None,
+                           end: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Aggregation that returns the newest stonk_history snapshot with only the
+    requested symbol and date range, so the other bars never leave MongoDB.
+
+    Works for all three stored layouts: ``data`` as a dict of symbols,
+    ``data`` as a flat list of records and ``stocks`` as a dict of symbols.
+    """
+    conditions = _range_conditions(start, end)
+    list_conditions = conditions + ([{"$eq": ["$$bar.symbol", {"$literal": symbol}]}] if symbol else [])
+
+    return [
+        {"$sort": {"timestamp": -1}},
+        {"$limit": 1},
+        {"$project": {
+            "timestamp": 1,
+            "data": {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$isArray": "$data"}, "then": _filter_bars("$data", list_conditions)},
+                        {"case": {"$eq": [{"$type": "$data"}, "object"]},
+                         "then": _filter_symbol_map("data", symbol, conditions)},
+                    ],
+                    "default": "$$REMOVE"
+                }
+            },
+            "stocks": {
+                "$cond": [
+                    {"$eq": [{"$type": "$stocks"}, "object"]},
+                    _filter_symbol_map("stocks", symbol, conditions),
+                    "$$REMOVE"
+                ]
+            },
+        }},
+    ]
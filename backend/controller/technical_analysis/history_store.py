@@ -0,0 +1,201 @@
+"""
+Bucketed price-history store.
+
+Daily bars are kept in one document per (symbol, month) in the
+``stonk_history_buckets`` collection instead of one monolithic snapshot per
+run. A daily run only touches the current month's bucket of each symbol and a
+per-symbol read only loads the buckets in the requested range.
+
+Run ``python -m controller.technical_analysis.history_store migrate`` from the
+backend directory to copy the bars of existing ``stonk_history`` snapshots
+into buckets.
+"""
+import argparse
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReplaceOne
+
+BUCKET_COLLECTION = "stonk_history_buckets"
+SNAPSHOT_COLLECTION = "stonk_history"
+# Marker stored on stonk_history documents whose bars live in the buckets
+BUCKET_STORAGE = "buckets"
+
+
+def normalize_timestamp(value: Any) -> Any:
+    """Naive UTC datetime for any (pandas) timestamp, which is how MongoDB returns them"""
+    if hasattr(value, "to_pydatetime"):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_month(value: Any) -> str:
+    return normalize_timestamp(value).strftime("%Y-%m")
+
+
+def snapshot_to_symbol_bars(snapshot: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Extract ``{symbol: [bars]}`` from any of the legacy stonk_history layouts"""
+    if isinstance(snapshot.get("stocks"), dict):
+        return snapshot["stocks"]
+    data = snapshot.get("data")
+    if isinstance(data, dict):
+        return data
+    if isinstance(data, list):
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for record in data:
+            if isinstance(record, dict) and record.get("symbol"):
+                grouped.setdefault(record["symbol"], []).append(record)
+        return grouped
+    return {}
+
+
+def group_bars_by_bucket(history_data: Dict[str, List[Dict[str, Any]]]) -> Dict[Tuple[str, str], Dict[datetime, Dict[str, Any]]]:
+    """Group bars into ``{(symbol, month): {timestamp: bar}}`` with the symbol stripped from each bar"""
+    buckets: Dict[Tuple[str, str], Dict[datetime, Dict[str, Any]]] = {}
+    for symbol, bars in history_data.items():
+        for bar in bars:
+            if bar.get("timestamp") is None:
+                continue
+            timestamp = normalize_timestamp(bar["timestamp"])
+            stored = {key: value for key, value in bar.items() if key != "symbol"}
+            stored["timestamp"] = timestamp
+            buckets.setdefault((symbol, bucket_month(timestamp)), {})[timestamp] = stored
+    return buckets
+
+
+def upsert_history(collection, history_data: Dict[str, List[Dict[str, Any]]]) -> int:
+    """
+    Merge bars into their (symbol, month) buckets. Bars already stored for the
+    same timestamp are replaced, so re-running a day is idempotent.
+
+    Returns the number of buckets written.
+    """
+    incoming = group_bars_by_bucket(history_data)
+    if not incoming:
+        return 0
+
+    existing = collection.find(
+        {"$or": [{"symbol": symbol, "month": month} for symbol, month in incoming]},
+        {"_id": 0, "symbol": 1, "month": 1, "bars": 1}
+    )
+    merged = {key: {} for key in incoming}
+    for bucket in existing:
+        key = (bucket["symbol"], bucket["month"])
+        merged[key] = {normalize_timestamp(bar["timestamp"]): bar for bar in bucket.get("bars", [])}
+
+    now = datetime.now()
+    operations = []
+    for (symbol, month), bars in incoming.items():
+        combined = merged[(symbol, month)]
+        combined.update(bars)
+        ordered = [combined[timestamp] for timestamp in sorted(combined)]
+        operations.append(ReplaceOne(
+            {"symbol": symbol, "month": month},
+            {
+                "symbol": symbol,
+                "month": month,
+                "first": ordered[0]["timestamp"],
+                "last": ordered[-1]["timestamp"],
+                "count": len(ordered),
+                "bars": ordered,
+                "updated_at": now,
+            },
+            upsert=True
+        ))
+
+    collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def bucket_query(symbols: Optional[Iterable[str]] = None, start: Optional[date] = None,
+                 end: Optional[date] = None) -> Dict[str, Any]:
+    """Query selecting the buckets that can hold bars for the given symbols and date range"""
+    query: Dict[str, Any] = {}
+    if symbols:
+        query["symbol"] = {"$in": list(symbols)}
+    month_range = {}
+    if start:
+        month_range["$gte"] = start.strftime("%Y-%m")
+    if end:
+        month_range["$lte"] = end.strftime("%Y-%m")
+    if month_range:
+        query["month"] = month_range
+    return query
+
+
+BUCKET_PROJECTION = {"_id": 0, "symbol": 1, "month": 1, "bars": 1}
+
+
+def buckets_to_history(buckets: Iterable[Dict[str, Any]], start: Optional[date] = None,
+                       end: Optional[date] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Flatten buckets into ``{symbol: [bars]}`` in time order, trimmed to the date range"""
+    ordered = sorted(buckets, key=lambda bucket: (bucket["symbol"], bucket["month"]))
+    history: Dict[str, List[Dict[str, Any]]] = {}
+    for bucket in ordered:
+        bars = history.setdefault(bucket["symbol"], [])
+        for bar in bucket.get("bars", []):
+            day = bar["timestamp"].date()
+            if (start and day < start) or (end and day > end):
+                continue
+            bars.append({"symbol": bucket["symbol"], **bar})
+    return history
+
+
+def read_history(collection, symbols: Optional[Iterable[str]] = None, start: Optional[date] = None,
+                 end: Optional[date] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Read ``{symbol: [bars]}`` for the given symbols and date range"""
+    buckets = collection.find(bucket_query(symbols, start, end), BUCKET_PROJECTION)
+    return buckets_to_history(buckets, start, end)
+
+
+def migrate(db, dry_run: bool = False) -> int:
+    """
+    Copy the bars of every legacy stonk_history snapshot into buckets, oldest
+    first so newer snapshots win for overlapping days. Snapshots that already
+    point at the bucket store are skipped.
+
+    Returns the number of snapshots converted.
+    """
+    from controller.indexes import ensure_indexes
+
+    snapshots = db[SNAPSHOT_COLLECTION]
+    buckets = db[BUCKET_COLLECTION]
+    if not dry_run:
+        ensure_indexes(db, [BUCKET_COLLECTION])
+
+    converted = 0
+    cursor = snapshots.find({"storage": {"$ne": BUCKET_STORAGE}}).sort("timestamp", ASCENDING).batch_size(1)
+    for snapshot in cursor:
+        history_data = snapshot_to_symbol_bars(snapshot)
+        bar_count = sum(len(bars) for bars in history_data.values())
+        print(f"Snapshot {snapshot['_id']} ({snapshot.get('timestamp')}): {len(history_data)} symbols, {bar_count} bars")
+        if not dry_run:
+            written = upsert_history(buckets, history_data)
+            print(f"  wrote {written} buckets")
+        converted += 1
+    return converted
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Manage the bucketed stock history store")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="Convert legacy stonk_history snapshots into buckets")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted")
+    parsed = parser.parse_args(args)
+
+    from controller.mongodb import MongoDB
+
+    mongodb = MongoDB(db_name="PeliCanStonks")
+    try:
+        mongodb.connect()
+        if parsed.command == "migrate":
+            converted = migrate(mongodb.db, dry_run=parsed.dry_run)
+            print(f"✅ {'Checked' if parsed.dry_run else 'Migrated'} {converted} history snapshots")
+    finally:
+        mongodb.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Vectorized technical indicators and chart-pattern detection.
+
+Works on bars frames indexed by (symbol, timestamp) as returned by
+``fetch_stock_data``. Bars of all symbols are concatenated and every indicator
+is computed in one grouped pass, so a whole run costs a few pandas operations
+instead of one LLM call per pattern.
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+SMA_WINDOWS = (20, 50)
+EMA_SPANS = (12, 26)
+RSI_PERIOD = 14
+MACD_SIGNAL_SPAN = 9
+BOLLINGER_WINDOW = 20
+BOLLINGER_STDS = 2
+ATR_PERIOD = 14
+
+# Bars on each side a swing high/low must dominate
+SWING_ORDER = 5
+# Max relative difference between the two tops/bottoms or the two shoulders
+PATTERN_TOLERANCE = 0.03
+# Min relative depth of the trough/peak between them
+PATTERN_MIN_DEPTH = 0.03
+# Most recent patterns kept per symbol
+MAX_PATTERNS = 5
+
+INDICATOR_COLUMNS = (
+    [f"sma_{window}" for window in SMA_WINDOWS]
+    + [f"ema_{span}" for span in EMA_SPANS]
+    + [f"rsi_{RSI_PERIOD}", "macd", "macd_signal", "macd_hist", "bb_upper", "bb_mid", "bb_lower", f"atr_{ATR_PERIOD}"]
+)
+
+
+def combine_bars(bars_by_symbol: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """One (symbol, timestamp)-indexed frame holding the bars of every symbol"""
+    frames = [bars for bars in bars_by_symbol.values() if bars is not None and not bars.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames).sort_index()
+
+
+def _wilder(series: pd.Series, period: int) -> pd.Series:
+    """Wilder's smoothing (an EMA with alpha 1/period), per symbol"""
+    return series.groupby(level="symbol").transform(
+        lambda values: values.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    )
+
+
+def _ema(series: pd.Series, span: int) -> pd.Series:
+    return series.groupby(level="symbol").transform(
+        lambda values: values.ewm(span=span, adjust=False, min_periods=span).mean()
+    )
+
+
+def _rolling(series: pd.Series, window: int, how: str, center: bool = False) -> pd.Series:
+    rolled = series.groupby(level="symbol").rolling(window, center=center, min_periods=window)
+    return getattr(rolled, how)().droplevel(0)
+
+
+def compute_indicators(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add SMA, EMA, RSI, MACD, Bollinger band and ATR columns to a multi-symbol
+    bars frame. Values are NaN until a symbol has enough bars for the window.
+    """
+    result = bars.copy()
+    if result.empty:
+        return result
+    close = result["close"]
+    by_symbol = close.groupby(level="symbol")
+
+    for window in SMA_WINDOWS:
+        result[f"sma_{window}"] = _rolling(close, window, "mean")
+    for span in EMA_SPANS:
+        result[f"ema_{span}"] = _ema(close, span)
+
+    delta = by_symbol.diff()
+    average_gain = _wilder(delta.clip(lower=0), RSI_PERIOD)
+    average_loss = _wilder(-delta.clip(upper=0), RSI_PERIOD)
+    relative_strength = average_gain / average_loss.replace(0, np.nan)
+    result[f"rsi_{RSI_PERIOD}"] = (100 - 100 / (1 + relative_strength)).where(average_loss != 0, 100.0)
+
+    result["macd"] = result[f"ema_{EMA_SPANS[0]}"] - result[f"ema_{EMA_SPANS[1]}"]
+    result["macd_signal"] = _ema(result["macd"], MACD_SIGNAL_SPAN)
+    result["macd_hist"] = result["macd"] - result["macd_signal"]
+
+    middle = _rolling(close, BOLLINGER_WINDOW, "mean")
+    deviation = _rolling(close, BOLLINGER_WINDOW, "std")
+    result["bb_mid"] = middle
+    result["bb_upper"] = middle + BOLLINGER_STDS * deviation
+    result["bb_lower"] = middle - BOLLINGER_STDS * deviation
+
+    previous_close = by_symbol.shift()
+    true_range = pd.concat([
+        result["high"] - result["low"],
+        (result["high"] - previous_close).abs(),
+        (result["low"] - previous_close).abs(),
+    ], axis=1).max(axis=1)
+    result[f"atr_{ATR_PERIOD}"] = _wilder(true_range, ATR_PERIOD)
+    return result
+
+
+def find_swings(bars: pd.DataFrame, order: int = SWING_ORDER) -> pd.DataFrame:
+    """
+    Flag swing highs (``high`` is the max of the ``order`` bars on each side)
+    and swing lows (``low`` is the min) as boolean columns.
+    """
+    window = 2 * order + 1
+    result = bars.copy()
+    result["swing_high"] = result["high"] == _rolling(result["high"], window, "max", center=True)
+    result["swing_low"] = result["low"] == _rolling(result["low"], window, "min", center=True)
+    return result
+
+
+def _swing_sequence(bars: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Swings of one symbol in time order, alternating high/low: of consecutive
+    swings of the same type only the most extreme is kept.
+    """
+    swings = bars[bars["swing_high"] | bars["swing_low"]]
+    timestamps = swings.index.get_level_values("timestamp")
+    sequence: List[Dict[str, Any]] = []
+    for timestamp, high, low, is_high, is_low in zip(
+        timestamps, swings["high"].to_numpy(), swings["low"].to_numpy(),
+        swings["swing_high"].to_numpy(), swings["swing_low"].to_numpy()
+    ):
+        for kind, flagged, price in (("high", is_high, high), ("low", is_low, low)):
+            if not flagged:
+                continue
+            point = {"type": kind, "timestamp": timestamp, "price": float(price), "high": float(high), "low": float(low)}
+            if sequence and sequence[-1]["type"] == kind:
+                previous = sequence[-1]["price"]
+                if (kind == "high" and price > previous) or (kind == "low" and price < previous):
+                    sequence[-1] = point
+            else:
+                sequence.append(point)
+    return sequence
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= PATTERN_TOLERANCE * max(a, b)
+
+
+def _supporting_point(point: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": point["type"],
+        "day": pd.Timestamp(point["timestamp"]).strftime("%Y-%m-%d"),
+        "high": round(point["high"], 2),
+        "low": round(point["low"], 2),
+    }
+
+
+def _match_patterns(sequence: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    patterns = []
+    prices = [point["price"] for point in sequence]
+    for i in range(len(sequence)):
+        kind = sequence[i]["type"]
+        # Double top (H L H) / double bottom (L H L)
+        if i + 2 < len(sequence):
+            first, middle, second = prices[i:i + 3]
+            if kind == "high" and _close(first, second) and middle <= min(first, second) * (1 - PATTERN_MIN_DEPTH):
+                patterns.append(("Double Top", sequence[i:i + 3]))
+            if kind == "low" and _close(first, second) and middle >= max(first, second) * (1 + PATTERN_MIN_DEPTH):
+                patterns.append(("Double Bottom", sequence[i:i + 3]))
+        # Head and shoulders (H L H L H) / inverse (L H L H L)
+        if i + 4 < len(sequence):
+            left, _, head, _, right = prices[i:i + 5]
+            if kind == "high" and _close(left, right) and head >= max(left, right) * (1 + PATTERN_TOLERANCE):
+                patterns.append(("Head and Shoulders", sequence[i:i + 5]))
+            if kind == "low" and _close(left, right) and head <= min(left, right) * (1 - PATTERN_TOLERANCE):
+                patterns.append(("Inverse Head and Shoulders", sequence[i:i + 5]))
+    # Most recent first by completion date
+    patterns.sort(key=lambda pattern: pattern[1][-1]["timestamp"], reverse=True)
+    return [
+        {"pattern_name": name, "supporting_points": [_supporting_point(point) for point in points]}
+        for name, points in patterns[:MAX_PATTERNS]
+    ]
+
+
+def detect_patterns(bars: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+    """Chart patterns per symbol, in the ``detected_patterns`` format of the forecast"""
+    if bars.empty:
+        return {}
+    swings = find_swings(bars)
+    return {
+        symbol: _match_patterns(_swing_sequence(symbol_bars))
+        for symbol, symbol_bars in swings.groupby(level="symbol", sort=False)
+    }
+
+
+def latest_values(indicators: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Newest close and indicator values per symbol, rounded for storage and prompts"""
+    if indicators.empty:
+        return {}
+    latest = indicators.groupby(level="symbol").tail(1)
+    summaries = {}
+    for (symbol, timestamp), row in latest.iterrows():
+        values = {"day": pd.Timestamp(timestamp).strftime("%Y-%m-%d"), "close": round(float(row["close"]), 2)}
+        for column in INDICATOR_COLUMNS:
+            value = row[column]
+            values[column] = None if pd.isna(value) else round(float(value), 2)
+        summaries[symbol] = values
+    return summaries
+
+
+def analyze(bars_by_symbol: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+    """
+    Indicators and detected patterns for every symbol in one batch:
+    ``{symbol: {"indicators": {...}, "detected_patterns": [...]}}``
+    """
+    bars = combine_bars(bars_by_symbol)
+    if bars.empty:
+        return {}
+    indicators = latest_values(compute_indicators(bars))
+    patterns = detect_patterns(bars)
+    return {
+        symbol: {"indicators": indicators.get(symbol, {}), "detected_patterns": patterns.get(symbol, [])}
+        for symbol in bars_by_symbol
+        if symbol in indicators
+    }
@@ -1,22 +1,57 @@
+import asyncio
+import os
 from datetime import datetime, timedelta
 
-from controller.technical_analysis.alpaca_client import create_alpaca_client, fetch_stock_data
+from controller.technical_analysis.alpaca_client import create_alpaca_client
+from controller.technical_analysis.bar_store import bar_store
 from controller.technical_analysis.database import post_history, post_forecast
-from controller.technical_analysis.stock_forecast import get_stock_forecast
+from controller.technical_analysis.indicators import analyze
+from controller.technical_analysis.local_forecast import compare_forecasts, forecast_all
+from controller.technical_analysis.stock_forecast import attach_technical, get_stock_forecast_async
 
-def process_stock(symbol):
-    """Process a single stock and return its forecast and history data"""
-    alpaca_client = create_alpaca_client()
-
-    stock_bars = fetch_stock_data(
-        alpaca_client,
-        symbol=symbol,
-        start_date=(datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"),
-        end_date=(datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-    )
+# How many symbols are forecast at the same time
+MAX_CONCURRENCY = int(os.getenv("TECHNICAL_ANALYSIS_CONCURRENCY", 5))
+# Days of bars each forecast is based on
+LOOKBACK_DAYS = 365
+# llm: Gemini only; local: statistical forecast only; llm_with_fallback: local
+# forecast when Gemini fails; compare: Gemini with the local forecast attached
+FORECAST_ENGINES = ("llm", "local", "llm_with_fallback", "compare")
+FORECAST_ENGINE = os.getenv("FORECAST_ENGINE", "llm")
 
+async def forecast_stock(symbol, stock_bars, technical=None, engine="llm", local_forecast=None):
+    """Forecast a single stock with the selected engine"""
+    if engine == "local":
+        if local_forecast is None:
+            raise ValueError("not enough bars for a local forecast")
+        return dict(local_forecast)
+    
+    if engine == "llm_with_fallback" and local_forecast is not None:
+        try:
+            # A rate limit (or a pause already in effect) switches to the local forecast instead of waiting
+            return await get_stock_forecast_async(
+                stock_bars, max_retries=1, use_fallback_model=False, technical=technical, fail_fast=True
+            )
+        except Exception as e:
+            print(f"❌ Gemini forecast failed for {symbol}, using local forecast: {e}")
+            return dict(local_forecast)
+    
     # Use the Gemini-based stock forecast implementation
-    forecast_response = get_stock_forecast(stock_bars)
+    forecast_response = await get_stock_forecast_async(stock_bars, technical=technical)
+    if engine == "compare" and local_forecast is not None:
+        forecast_response["baseline_forecast"] = local_forecast
+        forecast_response["baseline_comparison"] = compare_forecasts(forecast_response, local_forecast)
+    return forecast_response
+
+async def process_stock(symbol, stock_bars, technical=None, engine="llm", local_forecast=None):
+    """
+    Forecast a single stock from its bars and return its forecast and history data.
+    ``technical`` holds the symbol's indicators and detected patterns; they are
+    summarized in the prompt and stored with the forecast. ``local_forecast`` is
+    the symbol's statistical forecast, used according to ``engine``.
+    """
+    forecast_response = await forecast_stock(symbol, stock_bars, technical, engine, local_forecast)
+    # Always present, even when the indicators could not be computed
+    attach_technical(forecast_response, technical)
     
     # Convert to dict and add symbol information to each record
     history_data = stock_bars.reset_index().to_dict(orient="records")
@@ -25,28 +60,92 @@ def process_stock(symbol):
     
     return forecast_response, history_data
 
-def main(symbols=None):
+async def process_stocks(jobs, max_concurrency):
+    """
+    Run process_stock for every (symbol, args) job at once, at most
+    ``max_concurrency`` at a time. Results (or exceptions) are in job order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run(symbol, args):
+        async with semaphore:
+            print(f"Processing {symbol}...")
+            return await process_stock(symbol, *args)
+    
+    return await asyncio.gather(*(run(symbol, args) for symbol, args in jobs), return_exceptions=True)
+
+def main(symbols=None, max_concurrency=None, engine=None):
     """
     Process multiple stock symbols and save their forecasts
     
+    Symbols are forecast concurrently on one event loop, sharing the async
+    Gemini client; a failing symbol is logged and skipped without affecting
+    the others.
+    
     Args:
         symbols: List of stock symbols to process. Defaults to ["AAPL", "TSLA", "NVDA"]
+        max_concurrency: Maximum number of symbols processed at once.
+                         Defaults to TECHNICAL_ANALYSIS_CONCURRENCY (5)
+        engine: One of FORECAST_ENGINES. Defaults to FORECAST_ENGINE ("llm")
     """
     if symbols is None:
         symbols = ["AAPL", "TSLA", "NVDA"]
+    engine = engine or FORECAST_ENGINE
+    if engine not in FORECAST_ENGINES:
+        raise ValueError(f"Unknown forecast engine {engine!r}, expected one of {', '.join(FORECAST_ENGINES)}")
     
     results = {}
     all_history_data = {}
     
-    for symbol in symbols:
-        print(f"Processing {symbol}...")
+    # Download only the days missing from the local bar store (in batched
+    # requests over one client) and read the trailing window back from it
+    try:
+        bars_by_symbol = bar_store.update(
+            create_alpaca_client(),
+            symbols,
+            end_date=(datetime.now() - timedelta(days=1)).date(),
+            lookback_days=LOOKBACK_DAYS
+        )
+    except Exception as e:
+        print(f"❌ Error fetching stock bars for {', '.join(symbols)}: {e}")
+        bars_by_symbol = {}
+    
+    # Indicators and chart patterns for every symbol in one vectorized pass
+    try:
+        technical_by_symbol = analyze(bars_by_symbol)
+    except Exception as e:
+        print(f"❌ Error computing technical indicators: {e}")
+        technical_by_symbol = {}
+    
+    # Statistical forecasts for every symbol at once (milliseconds, no API calls)
+    local_forecasts = {}
+    if engine != "llm":
         try:
-            forecast, history_data = process_stock(symbol)
-            results[symbol] = forecast
-            all_history_data[symbol] = history_data
-            print(f"✅ Successfully processed {symbol}")
+            local_forecasts = forecast_all(bars_by_symbol)
         except Exception as e:
-            print(f"❌ Error processing {symbol}: {e}")
+            print(f"❌ Error computing local forecasts: {e}")
+    
+    jobs = []
+    for symbol in symbols:
+        if symbol not in bars_by_symbol:
+            print(f"❌ Error processing {symbol}: no bars returned by Alpaca")
+            continue
+        jobs.append((symbol, (
+            bars_by_symbol[symbol], technical_by_symbol.get(symbol), engine, local_forecasts.get(symbol)
+        )))
+    
+    max_concurrency = max(1, max_concurrency or MAX_CONCURRENCY)
+    outcomes = asyncio.run(process_stocks(jobs, max_concurrency)) if jobs else []
+    
+    # Collected in the order the symbols were given so the saved documents are deterministic
+    for (symbol, _), outcome in zip(jobs, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"❌ Error processing {symbol}: {outcome}")
+            continue
+        forecast, history_data = outcome
+        results[symbol] = forecast
+        all_history_data[symbol] = history_data
+        print(f"✅ Successfully processed {symbol}")
     
     # Save all forecasts to database
     post_forecast(results)
@@ -1,16 +1,30 @@
-import os
+import asyncio
 import json
-import time
 import google.api_core.exceptions
-import google.generativeai as genai
 from pathlib import Path
 from dotenv import load_dotenv
 
+from controller.llm_cache import llm_cache
+from controller.llm_client import llm_client
+from controller.llm_parsing import FORECAST_DAYS, extract_json, merge_forecast, parse_forecast
+from controller.prompt_encoding import PROMPT_TOKEN_BUDGET, compact_json, estimate_tokens, fit_bars_to_budget, log_prompt_size
+
 # Load .env
 env_path = Path(__file__).parent.parent.parent / '.env'
 print(f"Looking for .env file at: {env_path}")
 load_dotenv(dotenv_path=env_path)
 
+# Bump whenever the prompt template or schema changes so cached forecasts are not reused
+PROMPT_VERSION = "2"
+
+# Set the generation config to emphasize structured output
+GENERATION_CONFIG = {
+    "temperature": 0.2,  # Lower temperature for more deterministic output
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+}
+
 def get_forecast_schema():
     return {
         "weekly_forecast": [
@@ -27,35 +41,19 @@ def get_forecast_schema():
         ],
         "recommendation": "buy/sell/hold",
         "confidence_level": 0,
-        "reasoning": "Explanation for the recommendation",
-        "detected_patterns": [
-            {
-                "pattern_name": "Name of the pattern",
-                "supporting_points": [
-                    {
-                        "type": "high/low",
-                        "day": "YYYY-MM-DD",
-                        "high": 0.0,
-                        "low": 0.0
-                    }
-                ]
-            }
-        ]
+        "reasoning": "Explanation for the recommendation"
     }
 
-def create_prompt(stock_bars):
-    schema = get_forecast_schema()
-    
-    return f"""
+PROMPT_TEMPLATE = """
 You are a stock market expert.
-Here is recent stock data:
+Here is recent stock data as CSV (daily bars; older rows may be weekly bars labelled by their last trading day):
 
-{stock_bars.to_string(index=False)}
-
-Based on this trend, predict the stock movement for the next 30 days and also provide a reasoning and trading patterns (the beginning and end date of the detected pattern) that supports your prediction.
+{bars}
+{technical}
+Based on this trend, predict the stock movement for the next 30 days and also provide a reasoning that supports your prediction.
 Provide your prediction and the reasons in the following JSON structure:
 
-{json.dumps(schema, indent=2)}
+{schema}
 
 **CRITICAL REQUIREMENTS:** 
 - Your response MUST include EXACTLY 30 days in the weekly_forecast array - no more, no less.
@@ -64,16 +62,95 @@ Provide your prediction and the reasons in the following JSON structure:
 - Your response should start from the next trading day after the last day in the provided data.
 """
 
-def get_stock_forecast(stock_bars, max_retries=3, use_fallback_model=True):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise RuntimeError(f"Gemini API key missing in .env file at {env_path}")
+TECHNICAL_TEMPLATE = """
+Technical indicators as of the last bar and chart patterns detected in the bars (JSON):
+
+{summary}
+"""
+
+# Daily bars sent when indicators summarize the longer history; older bars are sent weekly
+RECENT_BARS_WITH_INDICATORS = 60
+
+def create_prompt(stock_bars, token_budget=None, technical=None):
+    """
+    Build the forecast prompt. ``technical`` is the symbol's entry from
+    ``indicators.analyze``; when given, it is included as a compact summary
+    and only the most recent bars are sent at daily resolution.
+    """
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    # Plain json.dumps so the 0.0 placeholders keep signalling float fields
+    schema = json.dumps(get_forecast_schema(), separators=(",", ":"))
+    technical_text = TECHNICAL_TEMPLATE.format(summary=compact_json(technical)) if technical else ""
+    # Whatever is left of the budget after the fixed instructions goes to the bars
+    overhead = estimate_tokens(PROMPT_TEMPLATE.format(bars="", technical=technical_text, schema=schema))
+    bars = fit_bars_to_budget(
+        stock_bars,
+        token_budget - overhead,
+        max_recent_rows=RECENT_BARS_WITH_INDICATORS if technical else None
+    )
+    return PROMPT_TEMPLATE.format(bars=bars, technical=technical_text, schema=schema)
+
+FOLLOW_UP_TEMPLATE = """{prompt}
+
+You already answered part of this request. Your valid answer so far:
+
+{partial}
+
+Respond with only a JSON object containing {request}, in the same structure as above and with no additional text.
+"""
 
-    # Configure the Gemini API
-    genai.configure(api_key=api_key)
+async def complete_forecast(model_name, prompt, forecast, missing, max_retries=3, fail_fast=False):
+    """
+    Ask the model for just the missing fields (or the remaining forecast days)
+    of a partial forecast and merge them in. Returns the forecast and what is
+    still missing.
+    """
+    days = forecast.get("weekly_forecast", [])
+    requests = []
+    for field in missing:
+        if field == "weekly_forecast" and days:
+            requests.append(
+                f'"weekly_forecast" with only the {FORECAST_DAYS - len(days)} trading days after {days[-1]["day"]}'
+            )
+        elif field == "weekly_forecast":
+            requests.append(f'"weekly_forecast" with all {FORECAST_DAYS} days')
+        else:
+            requests.append(f'"{field}"')
+    
+    # The forecast days so far are summarized by their range to keep the follow-up small
+    partial = {key: value for key, value in forecast.items() if key != "weekly_forecast"}
+    if days:
+        partial["weekly_forecast"] = f"{len(days)} days from {days[0]['day']} to {days[-1]['day']}"
+    follow_up = FOLLOW_UP_TEMPLATE.format(prompt=prompt, partial=compact_json(partial), request=" and ".join(requests))
     
+    print(f"Asking {model_name} only for the missing {', '.join(missing)}")
+    response_text = await llm_client.generate(
+        model_name, follow_up, generation_config=GENERATION_CONFIG, max_retries=max_retries, fail_fast=fail_fast
+    )
+    try:
+        update = extract_json(response_text)
+    except ValueError as e:
+        print(f"Error with follow-up from model {model_name}: {e}")
+        return forecast, missing
+    if not isinstance(update, dict):
+        return forecast, missing
+    return merge_forecast(forecast, update)
+
+def attach_technical(forecast, technical=None):
+    """Store the patterns and indicators a forecast was based on; empty when there are none"""
+    forecast["detected_patterns"] = technical["detected_patterns"] if technical else []
+    forecast["technical_indicators"] = technical["indicators"] if technical else {}
+    return forecast
+
+async def get_stock_forecast_async(stock_bars, max_retries=3, use_fallback_model=True, technical=None, fail_fast=False):
+    """
+    Gemini forecast for one stock. With ``fail_fast`` a rate limit (or a pause
+    already in effect) raises ResourceExhausted at once, for callers that have
+    another forecast to fall back on.
+    """
     # Create the prompt
-    prompt = create_prompt(stock_bars)
+    prompt = create_prompt(stock_bars, technical=technical)
+    log_prompt_size("stock forecast", prompt)
 
     # Try with the powerful model first, then fall back to a simpler model if needed
     models_to_try = ['gemini-1.5-flash']
@@ -82,6 +159,17 @@ def get_stock_forecast(stock_bars, max_retries=3, use_fallback_model=True):
     if use_fallback_model:
         models_to_try.append('gemini-1.5-flash')  # Fallback to a model with higher quota limits
     
+    # Identical prompts (same bars, template and model) reuse the stored forecast
+    cache_keys = {
+        model_name: llm_cache.key(prompt, model_name, PROMPT_VERSION, GENERATION_CONFIG)
+        for model_name in models_to_try
+    }
+    for model_name, cache_key in cache_keys.items():
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"Using cached forecast from model: {model_name}")
+            return attach_technical(dict(cached), technical)
+    
     last_exception = None
     
     for model_name in models_to_try:
@@ -89,59 +177,40 @@ def get_stock_forecast(stock_bars, max_retries=3, use_fallback_model=True):
         while retries < max_retries:
             try:
                 print(f"Attempting to use model: {model_name}")
-                model = genai.GenerativeModel(model_name)
-                
-                # Set the generation config to emphasize structured output
-                generation_config = {
-                    "temperature": 0.2,  # Lower temperature for more deterministic output
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 8192,
-                }
-                
-                response = model.generate_content(
+                # Rate limits are retried inside the client, with a backoff shared by all callers
+                response_text = await llm_client.generate(
+                    model_name,
                     prompt,
-                    generation_config=generation_config
+                    generation_config=GENERATION_CONFIG,
+                    max_retries=max_retries,
+                    fail_fast=fail_fast
                 )
                 
-                # Try to extract structured JSON from the response
-                response_text = response.text
+                # Keep whatever part of the answer is valid and ask only for what is missing
+                forecast, missing = parse_forecast(response_text)
+                if missing:
+                    forecast, missing = await complete_forecast(model_name, prompt, forecast, missing, max_retries, fail_fast)
+                missing_keys = [key for key in missing if key != "weekly_forecast"]
+                if missing_keys:
+                    raise ValueError(f"Missing {', '.join(repr(key) for key in missing_keys)} in response")
                 
-                # Find JSON content between triple backticks if present
-                if "```json" in response_text and "```" in response_text:
-                    json_content = response_text.split("```json")[1].split("```")[0]
-                elif "```" in response_text:
-                    json_content = response_text.split("```")[1].split("```")[0]
+                forecast_days = len(forecast["weekly_forecast"])
+                if missing:
+                    # Keep a short forecast rather than regenerate it, but don't cache it
+                    print(f"❌ Forecast from {model_name} has only {forecast_days} of {FORECAST_DAYS} days")
                 else:
-                    json_content = response_text
-                    
-                parsed_json = json.loads(json_content)
-                
-                # Validate the response structure
-                required_keys = ["weekly_forecast", "recommendation", "confidence_level", "reasoning", "detected_patterns"]
-                for key in required_keys:
-                    if key not in parsed_json:
-                        raise ValueError(f"Missing '{key}' key in response")
-                
-                # Ensure we have exactly 30 forecasted days
-                forecast_days = len(parsed_json["weekly_forecast"])
-      
+                    llm_cache.put(cache_keys[model_name], forecast, model_name)
                 print(f"Successfully generated forecast with {forecast_days} days")
-                return parsed_json
+                return attach_technical(dict(forecast), technical)
                 
             except google.api_core.exceptions.ResourceExhausted as e:
+                if fail_fast:
+                    raise
+                # The client already used up the retries for this model
                 last_exception = e
-                retry_delay = 10  # Default retry delay in seconds
-                
-                # Try to extract retry delay from error message if available
-                if hasattr(e, 'retry_delay') and hasattr(e.retry_delay, 'seconds'):
-                    retry_delay = e.retry_delay.seconds
-                
-                print(f"Rate limit exceeded. Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                retries += 1
+                break
                 
-            except (json.JSONDecodeError, ValueError) as e:
+            except ValueError as e:
                 last_exception = e
                 print(f"Error with model {model_name}: {e}")
                 # Don't retry for JSON parsing errors, try another model
@@ -151,7 +220,12 @@ def get_stock_forecast(stock_bars, max_retries=3, use_fallback_model=True):
                 last_exception = e
                 print(f"Unexpected error with model {model_name}: {e}")
                 retries += 1
-                time.sleep(5)  # Wait 5 seconds before retrying
+                if retries < max_retries:
+                    await asyncio.sleep(5)  # Wait 5 seconds before retrying
     
     # If we've exhausted all models and retries
-    raise RuntimeError(f"Failed to get valid response from Gemini API after multiple attempts: {last_exception}")
\ No newline at end of file
+    raise RuntimeError(f"Failed to get valid response from Gemini API after multiple attempts: {last_exception}")
+
+def get_stock_forecast(stock_bars, max_retries=3, use_fallback_model=True, technical=None):
+    """Blocking wrapper around get_stock_forecast_async for callers without an event loop"""
+    return asyncio.run(get_stock_forecast_async(stock_bars, max_retries, use_fallback_model, technical))
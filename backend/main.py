@@ -1,7 +1,10 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 import uvicorn
 
@@ -15,14 +18,46 @@ ALLOWED_ORIGINS = [FRONTEND_URL]
 if ENVIRONMENT == 'production':
     ALLOWED_ORIGINS.append('https://www.google.com')  # the production URL
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open one pooled MongoDB client per worker and close it on shutdown."""
+    from controller.indexes import ensure_indexes
+    from routes.stocks_routes import async_mongodb, mongodb
+
+    try:
+        await async_mongodb.connect()
+    except Exception as e:
+        # Don't kill the worker over a short outage; requests connect again lazily
+        print(f"❌ MongoDB unavailable at startup, continuing without it: {e}")
+    if mongodb.db is not None and os.getenv("MONGO_ENSURE_INDEXES", "true").lower() != "false":
+        try:
+            await asyncio.to_thread(ensure_indexes, mongodb.db)
+            print("✅ MongoDB indexes ensured.")
+        except Exception as e:
+            print(f"❌ Failed to ensure MongoDB indexes: {e}")
+    try:
+        yield
+    finally:
+        await async_mongodb.disconnect()
+
 app = FastAPI(
     title="SaaS API",
     description="API for SaaS application",
     version="1.0.0",
     docs_url="/api/v1/docs",
-    openapi_url="/apispec.json"
+    openapi_url="/apispec.json",
+    lifespan=lifespan
 )
 
+# Response compression: brotli when the client supports it, gzip otherwise.
+# Small bodies (health checks, 304s) are left uncompressed.
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
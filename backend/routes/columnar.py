@@ -0,0 +1,62 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+COLUMNAR = "columnar"
+
+
+def records_to_columns(records: List[Dict[str, Any]], drop: Iterable[str] = ()) -> Dict[str, List[Any]]:
+    """
+    Turn a list of row dicts into one array per field. Fields are kept in
+    first-seen order and a record missing a field gets ``None`` in that column.
+    """
+    dropped = set(drop)
+    fields: Dict[str, None] = {}
+    for record in records:
+        for field in record:
+            if field not in dropped:
+                fields.setdefault(field)
+    return {field: [record.get(field) for record in records] for field in fields}
+
+
+def history_to_columnar(history: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Columnar copy of a stock history document: ``{symbol: {field: [values]}}``
+    under the same ``stocks``/``data`` key. The repeated ``symbol`` field is
+    dropped since it is the key, and old list-shaped ``data`` is grouped by symbol.
+    """
+    if not history:
+        return history
+    columnar = dict(history)
+    for key in ("stocks", "data"):
+        value = history.get(key)
+        if isinstance(value, list):
+            grouped: Dict[str, List[Dict[str, Any]]] = {}
+            for record in value:
+                grouped.setdefault(record.get("symbol"), []).append(record)
+            value = grouped
+        if isinstance(value, dict):
+            columnar[key] = {
+                symbol: records_to_columns(bars, drop=("symbol",)) for symbol, bars in value.items()
+            }
+    columnar["format"] = COLUMNAR
+    return columnar
+
+
+def _forecast_to_columnar(forecast: Any) -> Any:
+    if not isinstance(forecast, dict) or not isinstance(forecast.get("weekly_forecast"), list):
+        return forecast
+    return {**forecast, "weekly_forecast": records_to_columns(forecast["weekly_forecast"])}
+
+
+def technical_analysis_to_columnar(analysis: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Columnar copy of a technical analysis document, with every ``weekly_forecast`` as field arrays"""
+    if not analysis:
+        return analysis
+    columnar = dict(analysis)
+    if isinstance(analysis.get("stocks"), dict):
+        columnar["stocks"] = {
+            symbol: _forecast_to_columnar(forecast) for symbol, forecast in analysis["stocks"].items()
+        }
+    if "forecast" in analysis:
+        columnar["forecast"] = _forecast_to_columnar(analysis["forecast"])
+    columnar["format"] = COLUMNAR
+    return columnar
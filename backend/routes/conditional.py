@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+
+
+def snapshot_last_modified(metas: List[Optional[Dict[str, Any]]]) -> Optional[datetime]:
+    """Newest snapshot timestamp as an aware UTC datetime (second precision)"""
+    timestamps = [meta.get("timestamp") for meta in metas if meta]
+    timestamps = [ts for ts in timestamps if isinstance(ts, datetime)]
+    if not timestamps:
+        return None
+    # Snapshots are written with naive datetime.now(); MongoDB hands them back as naive UTC
+    latest = max(ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc) for ts in timestamps)
+    return latest.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def snapshot_etag(request: Request, metas: List[Optional[Dict[str, Any]]], variant: Any = None) -> Optional[str]:
+    """
+    Weak ETag for a response built from one or more snapshots.
+
+    It changes when any snapshot's ``_id``/``timestamp`` changes, and also
+    differs per query string and ``variant`` (e.g. a resolved default date
+    window) since those change the representation. It is weak because the
+    compressed and uncompressed encodings share it.
+    """
+    if not any(metas):
+        return None
+    digest = hashlib.sha1()
+    for meta in metas:
+        if meta:
+            digest.update(str(meta.get("_id")).encode())
+            digest.update(str(meta.get("timestamp")).encode())
+        digest.update(b"|")
+    digest.update(str(sorted(request.query_params.multi_items())).encode())
+    digest.update(str(variant).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def conditional_headers(etag: Optional[str], last_modified: Optional[datetime]) -> Dict[str, str]:
+    """Validator headers to attach to both 200 and 304 responses"""
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current snapshot"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence and uses weak comparison
+        if not etag:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in candidates:
+            return True
+        return any(_opaque_tag(tag) == _opaque_tag(etag) for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
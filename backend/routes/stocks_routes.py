@@ -1,14 +1,113 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import Dict, List, Any, Optional
-from controller.mongodb import MongoDB
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request, Response
+from typing import Dict, List, Any, Literal, Optional
+from datetime import date, timedelta
+from controller.mongodb import MongoDB, AsyncMongoDB
+from controller.snapshot_cache import snapshot_cache
+from controller.technical_analysis.history_query import build_history_pipeline, is_valid_symbol
+from controller.technical_analysis.history_store import (
+    BUCKET_COLLECTION, BUCKET_PROJECTION, BUCKET_STORAGE, bucket_query, buckets_to_history
+)
+from routes.columnar import COLUMNAR, history_to_columnar, technical_analysis_to_columnar
+from routes.conditional import conditional_headers, is_not_modified, snapshot_etag, snapshot_last_modified
+from routes.responses import BSONJSONResponse
 import sys
 import os
+import asyncio
 import importlib.util
 from pathlib import Path
 import controller.fundamental_analysis as run_fundamental_analysis
 
-router = APIRouter()
+router = APIRouter(default_response_class=BSONJSONResponse)
+# Shared, pooled client for this worker process. It is opened and closed by the
+# application lifespan in main.py, so handlers must not connect/disconnect it.
 mongodb = MongoDB(db_name="PeliCanStonks")
+# Non-blocking view of the same client for the async handlers below.
+async_mongodb = AsyncMongoDB(mongodb)
+
+# Default window for history read from the bucket store when no start date is
+# given, matching the year of bars the technical analysis pipeline downloads
+HISTORY_LOOKBACK_DAYS = int(os.getenv("HISTORY_LOOKBACK_DAYS", 365))
+
+async def get_latest_snapshot(collection_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the newest document of a collection, served from the in-process
+    snapshot cache. The returned document is shared and must not be mutated.
+    """
+    async def load():
+        return await async_mongodb.fetch_latest(collection_name)
+
+    return await snapshot_cache.get_or_load((collection_name,), load)
+
+async def get_snapshot_meta(collection_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get only the ``_id``, ``timestamp``, ``storage`` and ``symbols`` of the newest document. Uses the
+    cached snapshot when there is one, otherwise a tiny projection query.
+    """
+    snapshot = snapshot_cache.get((collection_name,))
+    if snapshot is not None:
+        return {key: snapshot.get(key) for key in ("_id", "timestamp", "storage", "symbols")}
+
+    async def load():
+        return await async_mongodb.fetch_latest(collection_name, projection={"_id": 1, "timestamp": 1, "storage": 1, "symbols": 1})
+
+    return await snapshot_cache.get_or_load((collection_name, "meta"), load)
+
+async def conditional_snapshot_response(request: Request, collection_names: List[str], build_body,
+                                        variant: Any = None) -> Response:
+    """
+    Answer a GET built from the latest snapshots of ``collection_names``.
+
+    Validators are computed from the snapshot metadata only, so a matching
+    If-None-Match / If-Modified-Since gets a 304 without the body ever being
+    loaded. The body is built afterwards and can only be the same or a newer
+    snapshot, so a client never caches stale data under a fresh ETag.
+    ``variant`` is anything besides the query string that shapes the body,
+    such as a default date window that moves with the calendar.
+    """
+    metas = await asyncio.gather(*(get_snapshot_meta(name) for name in collection_names))
+    etag = snapshot_etag(request, metas, variant)
+    last_modified = snapshot_last_modified(metas)
+    headers = conditional_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body = await build_body()
+    # Returning the response directly skips response_model validation; the
+    # BSON-aware encoder handles ObjectId/datetime values in the raw documents
+    return BSONJSONResponse(content=body, headers=headers)
+
+# Dashboard section name -> collection holding its latest snapshot
+DASHBOARD_SECTIONS = {
+    "financial_reports": "financial_reports",
+    "fundamental_analysis": "fundamental_analysis",
+    "technical_analysis": "technical_analysis",
+    "stock_history": "stonk_history",
+}
+
+def split_query_list(values: Optional[List[str]]) -> List[str]:
+    """Accept both repeated (?a=x&a=y) and comma separated (?a=x,y) query values"""
+    if not values:
+        return []
+    return [item.strip() for value in values for item in value.split(",") if item.strip()]
+
+def filter_snapshot_symbols(document: Optional[Dict[str, Any]], symbols: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Return a copy of a snapshot restricted to the given symbols.
+
+    Handles the per-symbol layouts used across collections: ``stocks`` dict,
+    ``data`` dict and the old ``data`` list of records carrying a ``symbol``.
+    """
+    if not document or not symbols:
+        return document
+    filtered = dict(document)
+    for key in ("stocks", "data"):
+        value = document.get(key)
+        if isinstance(value, dict):
+            filtered[key] = {symbol: value[symbol] for symbol in symbols if symbol in value}
+        elif isinstance(value, list):
+            wanted = set(symbols)
+            filtered[key] = [item for item in value if isinstance(item, dict) and item.get("symbol") in wanted]
+    return filtered
 
 # Import the technical analysis functions
 def load_technical_analysis():
@@ -38,91 +137,51 @@ def load_technical_analysis():
 run_technical_analysis = load_technical_analysis()
 
 @router.get("/financial-reports", response_model=Optional[Dict[str, Any]])
-async def get_financial_reports():
+async def get_financial_reports(request: Request):
     """
     Get the most recent financial report from the database
     """
     try:
-        mongodb.connect()
-        # Fetch the latest document by sorting on timestamp in descending order
-        # and limiting to 1 result
-        collection = mongodb.get_collection("financial_reports")
-        latest_report = collection.find().sort("timestamp", -1).limit(1)
-        
-        # Convert cursor to list and get the first (and only) item if it exists
-        reports_list = list(latest_report)
-        if not reports_list:
-            return None
-            
-        report = reports_list[0]
-        
-        # Convert ObjectId to string for JSON serialization
-        if "_id" in report:
-            report["_id"] = str(report["_id"])
-                
-        return report
+        # Latest document by timestamp, answered from memory when cached
+        return await conditional_snapshot_response(
+            request, ["financial_reports"], lambda: get_latest_snapshot("financial_reports")
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching financial reports: {str(e)}")
-    finally:
-        mongodb.disconnect()
 
 @router.get("/fundamental-analysis", response_model=Optional[Dict[str, Any]])
-async def get_fundamental_analysis():
+async def get_fundamental_analysis(request: Request):
     """
     Get the most recent fundamental analysis from the database
     """
     try:
-        mongodb.connect()
-        # Fetch the latest document by sorting on timestamp in descending order
-        # and limiting to 1 result
-        collection = mongodb.get_collection("fundamental_analysis")
-        latest_analysis = collection.find().sort("timestamp", -1).limit(1)
-        
-        # Convert cursor to list and get the first (and only) item if it exists
-        analysis_list = list(latest_analysis)
-        if not analysis_list:
-            return None
-            
-        analysis = analysis_list[0]
-        
-        # Convert ObjectId to string for JSON serialization
-        if "_id" in analysis:
-            analysis["_id"] = str(analysis["_id"])
-                
-        return analysis
+        # Latest document by timestamp, answered from memory when cached
+        return await conditional_snapshot_response(
+            request, ["fundamental_analysis"], lambda: get_latest_snapshot("fundamental_analysis")
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching fundamental analysis: {str(e)}")
-    finally:
-        mongodb.disconnect()
 
 @router.get("/technical-analysis", response_model=Optional[Dict[str, Any]])
-async def get_technical_analysis():
+async def get_technical_analysis(
+    request: Request,
+    response_format: Literal["rows", "columnar"] = Query("rows", alias="format")
+):
     """
     Get the most recent technical analysis from the database
+    
+    Args:
+        format: "rows" (default) or "columnar" to return each weekly_forecast as one array per field
     """
+    async def build():
+        # Latest document by timestamp, answered from memory when cached
+        analysis = await get_latest_snapshot("technical_analysis")
+        return technical_analysis_to_columnar(analysis) if response_format == COLUMNAR else analysis
+
     try:
-        mongodb.connect()
-        # Fetch the latest document by sorting on timestamp in descending order
-        # and limiting to 1 result
-        collection = mongodb.get_collection("technical_analysis")
-        latest_analysis = collection.find().sort("timestamp", -1).limit(1)
-        
-        # Convert cursor to list and get the first (and only) item if it exists
-        analysis_list = list(latest_analysis)
-        if not analysis_list:
-            return None
-            
-        analysis = analysis_list[0]
-        
-        # Convert ObjectId to string for JSON serialization
-        if "_id" in analysis:
-            analysis["_id"] = str(analysis["_id"])
-                
-        return analysis
+        return await conditional_snapshot_response(request, ["technical_analysis"], build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching technical analysis: {str(e)}")
-    finally:
-        mongodb.disconnect()
 
 @router.post("/technical-analysis/generate", response_model=Dict[str, Any])
 async def generate_technical_analysis(background_tasks: BackgroundTasks, symbols: Optional[List[str]] = None):
@@ -172,63 +231,140 @@ async def generate_fundamental_analysis(background_tasks: BackgroundTasks, symbo
         "status": "processing"
     }
 
+async def resolve_history_start(start: Optional[date] = None) -> Optional[date]:
+    """
+    First day of history actually served: runs in the bucket store default to
+    the last ``HISTORY_LOOKBACK_DAYS`` days, older snapshots to everything.
+    """
+    if start:
+        return start
+    meta = await get_snapshot_meta("stonk_history")
+    if meta and meta.get("storage") == BUCKET_STORAGE:
+        return date.today() - timedelta(days=HISTORY_LOOKBACK_DAYS)
+    return None
+
+async def load_stock_history(symbols: List[str], start: Optional[date] = None,
+                             end: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get the latest price history for the given symbols (all of the latest run's
+    if empty) and date range. Runs written to the bucket store are read bucket
+    by bucket; older monolithic snapshots are filtered inside MongoDB.
+    """
+    meta = await get_snapshot_meta("stonk_history")
+    if not meta:
+        return None
+
+    if meta.get("storage") == BUCKET_STORAGE:
+        start = start or date.today() - timedelta(days=HISTORY_LOOKBACK_DAYS)
+        # The bucket collection holds every symbol ever written; default to the latest run's
+        symbols = symbols or meta.get("symbols") or []
+
+        async def load_buckets():
+            buckets = await async_mongodb.fetch_data(
+                BUCKET_COLLECTION, bucket_query(symbols, start, end), BUCKET_PROJECTION
+            )
+            return {
+                "_id": meta["_id"],
+                "timestamp": meta.get("timestamp"),
+                "stocks": buckets_to_history(buckets, start, end)
+            }
+
+        key = ("stonk_history", BUCKET_STORAGE, tuple(symbols), start, end)
+        return await snapshot_cache.get_or_load(key, load_buckets)
+
+    if not (symbols or start or end):
+        return await get_latest_snapshot("stonk_history")
+
+    pipeline_symbol = symbols[0] if len(symbols) == 1 else None
+
+    async def load_filtered():
+        # Only the requested symbol/date range leaves the database
+        results = await async_mongodb.aggregate("stonk_history", build_history_pipeline(pipeline_symbol, start, end))
+        return results[0] if results else None
+
+    history = await snapshot_cache.get_or_load(("stonk_history", pipeline_symbol, start, end), load_filtered)
+    return history if pipeline_symbol else filter_snapshot_symbols(history, symbols)
+
 @router.get("/stock-history", response_model=Optional[Dict[str, Any]])
-async def get_stock_history(symbol: Optional[str] = None):
+async def get_stock_history(
+    request: Request,
+    symbol: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    response_format: Literal["rows", "columnar"] = Query("rows", alias="format")
+):
     """
     Get the most recent historical stock data
     
     Args:
         symbol: Optional stock symbol to filter results
+        start: Optional first day of bars to return (YYYY-MM-DD, inclusive)
+        end: Optional last day of bars to return (YYYY-MM-DD, inclusive)
+        format: "rows" (default) or "columnar" to return one array per field per symbol
     """
+    if symbol and not is_valid_symbol(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid symbol: {symbol}")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    async def build():
+        history = await load_stock_history([symbol] if symbol else [], history_start, end)
+        return history_to_columnar(history) if response_format == COLUMNAR else history
+
     try:
-        mongodb.connect()
-        collection = mongodb.get_collection("stonk_history")
-        latest_history = collection.find().sort("timestamp", -1).limit(1)
-        history_list = list(latest_history)
-        if not history_list:
-            return None
-        history = history_list[0]
-        # Convert ObjectId to string for JSON serialization
-        if "_id" in history:
-            history["_id"] = str(history["_id"])
-        # Handle new structure: data is a dict of symbols
-        if "data" in history and isinstance(history["data"], dict):
-            if symbol:
-                # Return only the requested symbol's array
-                symbol_data = history["data"].get(symbol, [])
-                return {
-                    "_id": history["_id"],
-                    "timestamp": history["timestamp"],
-                    "data": {symbol: symbol_data}
-                }
-            else:
-                # Return all symbols
-                return history
-        # Handle old structure: data is a list
-        elif "data" in history and isinstance(history["data"], list):
-            if symbol:
-                filtered = [item for item in history["data"] if item.get("symbol") == symbol]
-                return {
-                    "_id": history["_id"],
-                    "timestamp": history["timestamp"],
-                    "data": filtered
-                }
-            else:
-                return history
-        # Handle previous structure: stocks dict
-        elif "stocks" in history and isinstance(history["stocks"], dict):
-            if symbol:
-                return {
-                    "_id": history["_id"],
-                    "timestamp": history["timestamp"],
-                    "stocks": {symbol: history["stocks"].get(symbol, [])}
-                }
-            else:
-                return history
-        else:
-            # Unknown structure, return as is
-            return history
+        history_start = await resolve_history_start(start)
+        return await conditional_snapshot_response(request, ["stonk_history"], build, variant=(history_start, end))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching stock history: {str(e)}")
-    finally:
-        mongodb.disconnect() 
\ No newline at end of file
+
+@router.get("/dashboard", response_model=Dict[str, Any])
+async def get_dashboard(
+    request: Request,
+    symbols: Optional[List[str]] = Query(None),
+    fields: Optional[List[str]] = Query(None),
+    response_format: Literal["rows", "columnar"] = Query("rows", alias="format")
+):
+    """
+    Get the latest financial report, fundamental analysis, technical analysis
+    and stock history in a single response
+    
+    Args:
+        symbols: Optional stock symbols to keep in every section (repeated or comma separated)
+        fields: Optional sections to include (financial_reports, fundamental_analysis,
+                technical_analysis, stock_history). Defaults to all of them
+        format: "rows" (default) or "columnar" for the stock history and forecast arrays
+    """
+    symbol_list = split_query_list(symbols)
+    sections = split_query_list(fields) or list(DASHBOARD_SECTIONS)
+    unknown = [section for section in sections if section not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown dashboard fields: {', '.join(unknown)}. Expected any of: {', '.join(DASHBOARD_SECTIONS)}"
+        )
+
+    invalid = [symbol for symbol in symbol_list if not is_valid_symbol(symbol)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid symbols: {', '.join(invalid)}")
+
+    async def load_section(section: str):
+        if section == "stock_history":
+            history = await load_stock_history(symbol_list, history_start)
+            return history_to_columnar(history) if response_format == COLUMNAR else history
+        if section == "technical_analysis" and response_format == COLUMNAR:
+            analysis = await get_latest_snapshot("technical_analysis")
+            return technical_analysis_to_columnar(filter_snapshot_symbols(analysis, symbol_list))
+        return filter_snapshot_symbols(await get_latest_snapshot(DASHBOARD_SECTIONS[section]), symbol_list)
+
+    async def build():
+        # Fetch all sections concurrently; cached sections return immediately
+        snapshots = await asyncio.gather(*(load_section(section) for section in sections))
+        return dict(zip(sections, snapshots))
+
+    try:
+        history_start = await resolve_history_start() if "stock_history" in sections else None
+        return await conditional_snapshot_response(
+            request, [DASHBOARD_SECTIONS[section] for section in sections], build, variant=history_start
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching dashboard: {str(e)}")
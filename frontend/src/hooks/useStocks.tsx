@@ -83,6 +83,13 @@ interface StockHistory {
   stocks?: Record<string, StockHistoryPoint[]>;
 }
 
+interface Dashboard {
+  financial_reports: FinancialReport | null;
+  fundamental_analysis: FundamentalAnalysis | null;
+  technical_analysis: TechnicalAnalysis | null;
+  stock_history: StockHistory | null;
+}
+
 // API URL
 const API_URL = 'https://pelican-predict-backend.onrender.com';
 
@@ -97,18 +104,13 @@ export const useStocks = () => {
   const fetchData = async () => {
     try {
       setLoading(true);
-      // Fetch all data sources in parallel
-      const [reportResponse, analysisResponse, technicalResponse, historyResponse] = await Promise.all([
-        axios.get<FinancialReport>(`${API_URL}/stocks/financial-reports`),
-        axios.get<FundamentalAnalysis>(`${API_URL}/stocks/fundamental-analysis`),
-        axios.get<TechnicalAnalysis>(`${API_URL}/stocks/technical-analysis`),
-        axios.get<StockHistory>(`${API_URL}/stocks/stock-history`)
-      ]);
+      // Fetch all data sources in a single round trip
+      const { data } = await axios.get<Dashboard>(`${API_URL}/stocks/dashboard`);
       
-      setReport(reportResponse.data);
-      setAnalysis(analysisResponse.data);
-      setTechnicalAnalysis(technicalResponse.data);
-      setHistory(historyResponse.data);
+      setReport(data.financial_reports);
+      setAnalysis(data.fundamental_analysis);
+      setTechnicalAnalysis(data.technical_analysis);
+      setHistory(data.stock_history);
       setError(null);
     } catch (err) {
       console.error('Error fetching stock data:', err);